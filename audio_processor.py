@@ -2,15 +2,170 @@
 import sounddevice as sd
 import soundfile as sf
 import librosa
-import noisereduce as nr
 from scipy.io import wavfile
 import numpy as np
-from collections import deque
+import scipy.fft
+import scipy.signal
+import math
+import os
+import sys
+import struct
+import tempfile
 import threading
 import time
 from abc import ABC, abstractmethod
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from numba import njit
 from config import BASE_PARAMS
+try:
+    import pyudev  # 可选依赖，用于Linux下的声卡热插拔通知
+except ImportError:
+    pyudev = None
+
+@njit(cache=True, fastmath=True)
+def _downmix(block, mix_out):
+    """多声道混音为单声道（单次遍历，写入预分配缓冲区）"""
+    n_frames = min(block.shape[0], mix_out.shape[0])
+    n_channels = block.shape[1]
+    scale = 1.0 / n_channels
+    for i in range(n_frames):
+        acc = 0.0
+        for c in range(n_channels):
+            acc += block[i, c]
+        mix_out[i] = acc * scale
+
+@njit(cache=True, fastmath=True)
+def _mix_and_quantize(block, mix_out, pcm_out):
+    """多声道混音并同时量化为PCM_16（单次遍历）"""
+    n_frames = min(block.shape[0], mix_out.shape[0], pcm_out.shape[0])
+    n_channels = block.shape[1]
+    scale = 1.0 / n_channels
+    for i in range(n_frames):
+        acc = 0.0
+        for c in range(n_channels):
+            acc += block[i, c]
+        v = acc * scale
+        mix_out[i] = v
+        v = min(max(v, -1.0), 1.0) * 32767.0
+        pcm_out[i] = np.int16(v + 0.5 if v >= 0.0 else v - 0.5)
+
+def _to_pcm16(y: np.ndarray) -> np.ndarray:
+    """将float32音频原地限幅缩放后转换为int16（写文件时libsndfile无需再逐点转换）"""
+    np.clip(y, -1.0, 1.0, out=y)
+    y *= 32767.0
+    return np.rint(y, out=y).astype(np.int16)
+
+@lru_cache(maxsize=None)
+def _resample_filter(up: int, down: int) -> np.ndarray:
+    """按(up, down)缓存resample_poly使用的多相低通FIR滤波器（与scipy默认设计一致）"""
+    max_rate = max(up, down)
+    taps = scipy.signal.firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+    return taps.astype(np.float32)
+
+@njit(nogil=True, cache=True)
+def _resample_stream(buf, hist, n_new, n_total, taps, up, down, out):
+    """
+    流式多相重采样，输出与scipy.signal.upfirdn(taps * up, x, up, down)在同一输出网格上逐点相同
+    滤波器状态即buf头部保存的历史输入，块边界处不补边、不产生瞬态
+    :param buf: 前hist个为历史输入，本次新输入位于buf[hist:hist + n_new]
+    :param n_total: 包含本次在内累计输入的采样点数
+    :param out: 写入截至最新输入可计算的最后len(out)个输出采样
+    """
+    base = n_total - (hist + n_new)  # buf[0]对应的累计输入索引
+    n_taps = taps.shape[0]
+    m_last = (n_total * up - 1) // down
+    m_first = m_last - out.shape[0] + 1
+    for o in range(out.shape[0]):
+        j = (m_first + o) * down  # 输出采样在上采样序列中的位置
+        k = j % up                # 与输入采样对齐的第一个抽头
+        i = j // up - base
+        acc = 0.0
+        while k < n_taps and i >= 0:
+            acc += taps[k] * buf[i]
+            k += up
+            i -= 1
+        out[o] = acc * up
+    # 保留最新的hist个输入作为下一块的历史
+    for i in range(hist):
+        buf[i] = buf[n_new + i]
+_WAV_HEADER_BYTES = 44
+
+def _wav_header(sample_rate: int, data_bytes: int) -> bytes:
+    """生成单声道PCM_16 WAV文件头"""
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_bytes, b'WAVE',
+        b'fmt ', 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+        b'data', data_bytes
+    )
+
+def _close_capture(mm: np.memmap) -> None:
+    """刷新并显式关闭录音映射（Windows下映射视图未关闭时无法截断、重命名或删除文件）"""
+    mm.flush()
+    mm._mmap.close()
+
+# 谱减法降噪参数
+_DENOISE_N_FFT = 2048
+_DENOISE_HOP = _DENOISE_N_FFT // 4
+_DENOISE_WINDOW = np.hanning(_DENOISE_N_FFT + 1)[:-1].astype(np.float32)  # 周期Hann窗，只计算一次
+_DENOISE_OVER_SUBTRACTION = 1.5   # 噪声谱过减系数
+_DENOISE_GAIN_FLOOR = 0.05        # 增益下限，避免过度抑制产生音乐噪声
+
+def _stft_frames(y: np.ndarray) -> np.ndarray:
+    """两端补零后按_DENOISE_HOP分帧并加窗，返回每帧的rfft结果"""
+    padded = np.pad(y, (_DENOISE_N_FFT, _DENOISE_N_FFT + (-len(y)) % _DENOISE_HOP))
+    frames = np.lib.stride_tricks.sliding_window_view(padded, _DENOISE_N_FFT)[::_DENOISE_HOP]
+    return scipy.fft.rfft(frames * _DENOISE_WINDOW, axis=1, workers=-1)
+
+def _estimate_noise_profile(noise: np.ndarray) -> np.ndarray:
+    """由一段纯噪声估计平均幅度谱"""
+    return np.abs(_stft_frames(noise)).mean(axis=0)
+
+def _denoise_stationary(y: np.ndarray, noise_profile: np.ndarray) -> np.ndarray:
+    """
+    平稳噪声谱减法降噪
+    :param y: 单声道音频
+    :param noise_profile: 噪声平均幅度谱（_estimate_noise_profile的结果）
+    :return: 与输入等长的降噪音频
+    """
+    spec = _stft_frames(y)
+    magnitude = np.abs(spec)
+    gain = 1.0 - _DENOISE_OVER_SUBTRACTION * noise_profile / np.maximum(magnitude, 1e-10)
+    np.maximum(gain, _DENOISE_GAIN_FLOOR, out=gain)
+    frames = scipy.fft.irfft(spec * gain, n=_DENOISE_N_FFT, axis=1, workers=-1) * _DENOISE_WINDOW
+    # 加权重叠相加：每帧拆成若干hop长度的子块后按偏移累加
+    n_frames, n_sub = len(frames), _DENOISE_N_FFT // _DENOISE_HOP
+    sub_blocks = frames.reshape(n_frames, n_sub, _DENOISE_HOP)
+    out = np.zeros((n_frames + n_sub - 1, _DENOISE_HOP))
+    norm = np.zeros_like(out)
+    window_sq = (_DENOISE_WINDOW ** 2).reshape(n_sub, _DENOISE_HOP)
+    for r in range(n_sub):
+        out[r:r + n_frames] += sub_blocks[:, r]
+        norm[r:r + n_frames] += window_sq[r]
+    out = out.ravel() / np.maximum(norm.ravel(), 1e-10)
+    return out[_DENOISE_N_FFT:_DENOISE_N_FFT + len(y)].astype(np.float32)
+
+# 模块导入时预编译，避免首次音频回调时触发JIT编译
+_downmix(np.zeros((1, 2), dtype=np.float32), np.zeros(1, dtype=np.float32))
+_mix_and_quantize(np.zeros((1, 2), dtype=np.float32), np.zeros(1, dtype=np.float32), np.zeros(1, dtype=np.int16))
+_resample_stream(np.zeros(3, dtype=np.float32), 1, 2, 2, np.ones(3, dtype=np.float32), 1, 1, np.zeros(2, dtype=np.float32))
+
+_SILENCE_CACHE = {}
+
+def silence(n: int, level: float = 0.0) -> np.ndarray:
+    """
+    获取长度为n的只读静音块，按(长度, 电平)缓存，重复调用不再分配内存
+    :param n: 采样点数
+    :param level: 填充值（如1e-6用于防止后续取对数时出现零值）
+    """
+    key = (n, level)
+    block = _SILENCE_CACHE.get(key)
+    if block is None:
+        block = np.full(n, level, dtype=np.float32)
+        block.setflags(write=False)
+        block = _SILENCE_CACHE.setdefault(key, block)
+    return block
 
 class BaseAudioProcessor(ABC):
     """音频处理器抽象基类，定义公共接口和基础功能"""
@@ -30,29 +185,25 @@ class BaseAudioProcessor(ABC):
         self.n_fft = self.base_n_fft
         self.data_ready = threading.Event()  # 数据就绪事件
         self.lock = threading.Lock()         # 线程安全锁
-        self._observers = []                 # 参数观察者列表
+        self._observers = []                 # 参数观察者回调列表
 
     def add_params_observer(self, observer: callable) -> None:
         """
         添加参数变化观察者
-        :param observer: 观察者回调函数，格式：func(sample_rate: int, chunk_size: int)
+        :param observer: 观察者回调函数，格式：func(sample_rate: int, chunk_size: int, n_fft: int)，
+                         或实现了on_audio_params_changed方法的对象
         """
-        if observer not in self._observers:
-            self._observers.append(observer)
-            params = (self.sample_rate, self.chunk_size, self.n_fft)
-            if callable(observer):
-                observer(*params)
-            elif hasattr(observer, 'on_audio_params_changed'):
-                observer.on_audio_params_changed(*params)
+        # 注册时一次性解析出回调函数，通知时无需再做类型探测
+        fn = observer if callable(observer) else getattr(observer, 'on_audio_params_changed', None)
+        if fn is None or fn in self._observers: return
+        self._observers.append(fn)
+        fn(self.sample_rate, self.chunk_size, self.n_fft)
 
     def _notify_observers(self) -> None:
         """通知所有观察者参数已更新"""
         params = (self.sample_rate, self.chunk_size, self.n_fft)
-        for observer in self._observers:
-            if callable(observer):
-                observer(*params)
-            elif hasattr(observer, 'on_audio_params_changed'):
-                observer.on_audio_params_changed(*params)
+        for fn in self._observers:
+            fn(*params)
 
     def set_sample_rate(self, sample_rate: int) -> None:
         """设置采样率"""
@@ -81,44 +232,95 @@ class RealtimeAudioProcessor(BaseAudioProcessor):
     """实时音频输入处理器"""
     def __init__(self):
         super().__init__(
-            default_sample_rate=BASE_PARAMS['default_sample_rate'],
-            default_chunk_size=BASE_PARAMS['chunk_size'],
-            default_n_fft=BASE_PARAMS['n_fft']
+            default_sample_rate=BASE_PARAMS.default_sample_rate,
+            default_chunk_size=BASE_PARAMS.chunk_size,
+            default_n_fft=BASE_PARAMS.n_fft
         )
-        self.audio_blocks = deque(maxlen=100)  # 环形缓冲区存储最近100个块
         self.device_available = False        # 输入设备状态
         self.processed_blocks = 0            # 已处理块计数器
         self.start_time = time.time()        # 处理开始时间
         self.stream = None                   # 音频流对象
-        self._init_device_monitor()          # 启动设备监控线程
+        # 三缓冲：回调写入既非最新、也未被读取方认领的槽位，读取方认领最新槽位后可一直使用到下次读取
+        # 选取与认领槽位都在_slot_lock内完成（只交换索引，持锁时间极短）
+        self._slots = None
+        self._slot_lock = threading.Lock()
+        self._latest = 0                     # 最新完整数据所在的槽位
+        self._reading = -1                   # 读取方认领的槽位
+        self._last_signal = 0.0              # 上次发出数据就绪通知的时间（monotonic）
+        self._device_sample_rate = self.base_sample_rate  # 输入设备实际采样率
+        self._device_blocksize = self.chunk_size          # 按设备采样率换算的回调块大小
+        self._resample_ratio = (1, 1)        # 设备采样率到基准采样率的重采样比例(up, down)
+        self._device_mix = None              # 设备采样率下的混音缓冲区（需要重采样时使用）
+        self._resample_taps = None           # 重采样FIR滤波器
+        self._resample_buf = None            # 重采样输入：历史采样 + 本次混音（_device_mix为其尾部视图）
+        self._resample_hist = 0              # 跨块保留的历史采样点数（滤波器状态）
+        self._resample_pos = 0               # 累计输入的采样点数，确定输出网格的相位
 
         # 新增录音相关属性
         self.recording_lock = threading.Lock()    # 录音专用锁
         self._is_recording = False                # 录音状态标志
-        self.recording_buffer = []                # 录音数据缓冲区
         self.active_recording_blocks = 0          # 录音块计数器
+        self._rec_path = None                     # 录音临时文件（预留WAV文件头，数据区内存映射）
+        self._rec_mm = None                       # 录音数据区的内存映射（int16）
+        self._rec_pos = 0                         # 已写入的采样点数
+        self._rec_sample_rate = 0                 # 录音采样率
+        self._rec_grow_future = None              # 进行中的映射区扩容任务（在后台线程执行）
+        self._rec_dropped = 0                     # 扩容未及时完成而丢弃的采样点数
+        self._capture_executor = ThreadPoolExecutor(max_workers=1)  # 录音文件扩容（文件I/O不放在音频回调中）
 
         self.reduce_noise = False                 # 录音保存时是否额外生成降噪后的音频
+        self._denoise_executor = ThreadPoolExecutor(max_workers=1)  # 后台降噪任务（按提交顺序执行）
+        self.on_denoise_saved = None              # 降噪文件写入完成后的回调（在降噪线程中调用，参数为文件名）
+
+        self.add_params_observer(self._on_audio_params_changed)
+        self._init_device_monitor()          # 启动设备监控线程
 
     def _init_device_monitor(self) -> None:
-        """启动独立的设备状态监控线程"""
-        def monitor_task():
+        """启动独立的设备状态监控线程（Linux下优先使用udev热插拔事件，否则轮询）"""
+        def check_devices():
+            devices = sd.query_devices()
+            has_input = any(d['max_input_channels'] > 0 for d in devices)
+            if has_input != self.device_available:
+                self.device_available = has_input
+                self._handle_device_change()
+
+        def poll_task():
+            # 轮询时只读取设备数量（开销极小），数量变化时才完整查询设备列表
+            last_count = None
             while True:
                 try:
-                    devices = sd.query_devices()
-                    has_input = False
-                    for d in devices:
-                        if d['max_input_channels'] > 0:
-                            has_input = True
-                    if has_input != self.device_available:
-                        self.device_available = has_input
-                        self._handle_device_change()
+                    count = sd._lib.Pa_GetDeviceCount()
+                    if count != last_count:
+                        last_count = count
+                        check_devices()
+                except Exception as e:
+                    print(f"设备监控异常: {e}")
+                time.sleep(BASE_PARAMS.device_check_interval)
+
+        def udev_task():
+            try:
+                monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+                monitor.filter_by('sound')
+                monitor.start()
+            except Exception as e:
+                print(f"udev监控启动失败，改为轮询: {e}")
+                poll_task()
+                return
+            try:
+                check_devices()
+            except Exception as e:
+                print(f"设备监控异常: {e}")
+            # 阻塞等待声卡插拔事件，无事件时不占用CPU
+            for device in iter(monitor.poll, None):
+                if device.action not in ('add', 'remove'): continue
+                try:
+                    check_devices()
                 except Exception as e:
                     print(f"设备监控异常: {e}")
-                time.sleep(BASE_PARAMS['device_check_interval'])
 
+        use_udev = pyudev is not None and sys.platform.startswith('linux')
         threading.Thread(
-            target=monitor_task,
+            target=udev_task if use_udev else poll_task,
             daemon=True
         ).start()
 
@@ -127,99 +329,252 @@ class RealtimeAudioProcessor(BaseAudioProcessor):
         if self.device_available:
             input_device = sd.query_devices(sd.default.device[0])
             channels = input_device['max_input_channels']
-            self.set_sample_rate(input_device['default_samplerate'])
+            self._set_device_sample_rate(int(input_device['default_samplerate']))
             print(f"检测到输入设备（{channels}声道），启动音频流...")
             self._start_stream(channels)
         else:
             print("输入设备已断开")
             self._stop_stream()
 
+    def _set_device_sample_rate(self, device_sample_rate: int) -> None:
+        """
+        设置输入设备采样率
+        分析参数始终保持基准采样率，设备采样率不同时在回调中重采样，
+        chunk_size与n_fft不变，下游缓冲区与FFT相关的预计算无需重建
+        """
+        g = math.gcd(device_sample_rate, self.base_sample_rate)
+        up, down = self.base_sample_rate // g, device_sample_rate // g
+        self._device_sample_rate = device_sample_rate
+        self._resample_ratio = (up, down)
+        # 回调块大小取重采样后不少于chunk_size个采样点的最小值
+        self._device_blocksize = -(-self.chunk_size * down // up)
+        self._resample_pos = 0
+        if up != down:
+            # 预先设计滤波器并分配缓冲区，避免在音频回调中计算或分配内存
+            # 每块新输入至少覆盖chunk_size个输出，历史再覆盖滤波器跨度即可算出完整的一块输出
+            self._resample_taps = _resample_filter(up, down)
+            self._resample_hist = -(-len(self._resample_taps) // up) + 1
+            self._resample_buf = np.zeros(self._resample_hist + self._device_blocksize, dtype=np.float32)
+            self._device_mix = self._resample_buf[self._resample_hist:]
+        else:
+            self._resample_taps = None
+            self._resample_buf = None
+            self._resample_hist = 0
+            self._device_mix = np.zeros(self._device_blocksize, dtype=np.float32)
+
+    def _on_audio_params_changed(self, sample_rate: int, chunk_size: int, n_fft: int) -> None:
+        """音频参数变化时重新分配回调缓冲区"""
+        with self._slot_lock:
+            self._slots = [np.zeros(chunk_size, dtype=np.float32) for _ in range(3)]
+            self._latest = 0
+            self._reading = -1
+
     def _audio_callback(self, indata: np.ndarray, *_) -> None:
         """音频输入回调（由sounddevice驱动）"""
-        with self.lock:
-            if indata.ndim == 2 and indata.shape[1] >= 2:
-                # 双声道：取平均值合并
-                processed_data = indata.mean(axis=1)
+        frames = indata.reshape(len(indata), -1)
+        # 混音写入读取方未使用的槽位，写完后发布为最新
+        with self._slot_lock:
+            write_idx = next(i for i in range(3) if i != self._latest and i != self._reading)
+        up, down = self._resample_ratio
+        resample = up != down
+        # 采样率一致时直接混音到写入槽位，否则先在设备采样率下混音再重采样
+        mixed = self._device_mix if resample else self._slots[write_idx]
+        with self.recording_lock:
+            if self._is_recording:
+                # 录音时混音与PCM_16量化合并为一次遍历，直接写入映射的文件页
+                # 回调只写入已映射的空间：用量过半时请求后台扩容，空间不足时丢弃超出部分
+                n = len(frames)
+                capacity = len(self._rec_mm)
+                if self._rec_grow_future is None and self._rec_pos + n > capacity // 2:
+                    self._rec_grow_future = self._capture_executor.submit(
+                        self._grow_capture, self._rec_mm, self._rec_path, capacity * 2)
+                n_write = min(n, capacity - self._rec_pos)
+                if n_write < n:
+                    self._rec_dropped += n - n_write
+                    _downmix(frames, mixed)
+                if n_write > 0:
+                    _mix_and_quantize(frames[:n_write], mixed, self._rec_mm[self._rec_pos:self._rec_pos + n_write])
+                self._rec_pos += n_write
+                self.active_recording_blocks += 1
             else:
-                # 单声道：直接取数据
-                processed_data = indata[:, 0] if indata.ndim == 2 else indata.flatten()
-            self.audio_blocks.append(processed_data.copy())
-            self.processed_blocks += 1
-
-            # 新增录音数据收集
-            with self.recording_lock:
-                if self._is_recording:
-                    self.recording_buffer.append(processed_data.copy())
-                    self.active_recording_blocks += 1
-        self.data_ready.set()
+                _downmix(frames, mixed)
+        if resample:
+            # 滤波器状态跨块延续，结果直接写入槽位
+            n_new = min(len(frames), len(mixed))
+            self._resample_pos += n_new
+            _resample_stream(self._resample_buf, self._resample_hist, n_new, self._resample_pos,
+                             self._resample_taps, up, down, self._slots[write_idx])
+        with self._slot_lock:
+            self._latest = write_idx
+        self.processed_blocks += 1
+        # 按渲染间隔合并通知，减少对计算线程的无效唤醒
+        now = time.monotonic()
+        if now - self._last_signal >= BASE_PARAMS.render_interval:
+            self._last_signal = now
+            self.data_ready.set()
+
+    def _map_capture(self, capacity: int) -> np.memmap:
+        """将录音临时文件扩展到指定容量并映射数据区（稀疏文件，不实际占用磁盘）"""
+        return self._map_capture_file(self._rec_path, capacity)
+
+    def _map_capture_file(self, path: str, capacity: int) -> np.memmap:
+        """将指定录音临时文件扩展到指定容量并映射数据区"""
+        os.truncate(path, _WAV_HEADER_BYTES + capacity * 2)
+        return np.memmap(path, dtype='<i2', mode='r+',
+                         offset=_WAV_HEADER_BYTES, shape=(capacity,))
+
+    def _grow_capture(self, old_mm: np.memmap, path: str, capacity: int) -> None:
+        """
+        在后台线程中扩大录音映射区（由音频回调在用量过半时提交）
+        新旧映射对应同一文件，回调写入旧映射的数据在新映射中同样可见，锁内只交换引用
+        """
+        try:
+            new_mm = self._map_capture_file(path, capacity)
+        except Exception as e:
+            print(f"扩展录音文件失败: {e}")
+            new_mm = None
+        with self.recording_lock:
+            swapped = new_mm is not None and self._rec_mm is old_mm
+            if swapped:
+                self._rec_mm = new_mm
+            self._rec_grow_future = None
+        # 回调只在锁内访问当前映射，交换后旧映射（或录音已停止时的新映射）不再被使用
+        try:
+            if swapped:
+                _close_capture(old_mm)
+            elif new_mm is not None:
+                _close_capture(new_mm)
+        except Exception as e:
+            print(f"关闭录音映射失败: {e}")
 
     def start_recording(self) -> None:
-        """开始录音"""
+        """开始录音（数据在回调中直接写入内存映射的临时文件）"""
         with self.recording_lock:
             if self._is_recording: return
+            try:
+                fd, self._rec_path = tempfile.mkstemp(suffix='.wav.part', dir='.')
+                os.close(fd)
+                self._rec_sample_rate = int(self._device_sample_rate)  # 录音保存设备原始采样率
+                capacity = int(BASE_PARAMS.recording_prealloc_seconds * self._rec_sample_rate)
+                self._rec_mm = self._map_capture(capacity)
+            except Exception as e:
+                print(f"创建录音文件失败: {e}")
+                if self._rec_path is not None and os.path.exists(self._rec_path):
+                    os.remove(self._rec_path)
+                self._rec_path = None
+                return
+            self._rec_pos = 0
+            self._rec_dropped = 0
             self._is_recording = True
-            self.recording_buffer.clear()
             self.active_recording_blocks = 0
             print("录音已开始...")
 
     def stop_recording(self) -> None:
-        """停止录音并保存文件"""
+        """停止录音并保存文件（文件写入与降噪均在录音锁之外进行）"""
+        # 锁内只切换状态并取出录音数据的引用，使音频回调不会因保存文件而等待
         with self.recording_lock:
             if not self._is_recording: return
             self._is_recording = False
-            if len(self.recording_buffer) > 0:
-                try:
-                    audio_data = np.concatenate(self.recording_buffer)
-                    # 维度修正
-                    if audio_data.ndim == 1:
-                        audio_data = audio_data.reshape(-1, 1)
-                    timestamp = datetime.now().strftime("%H%M%S-%y%m%d")
-                    filename = f"{timestamp}.wav"
-                    sf.write(
-                        filename, 
-                        audio_data, 
-                        int(self.sample_rate),
-                        subtype='PCM_16'
-                    )
-
-                    if self.reduce_noise:
-                        # 关键修改点1：直接对内存数据降噪
-                        reduced_noise = nr.reduce_noise(
-                            y=audio_data.flatten(),  # 兼容单声道/立体声
-                            sr=int(self.sample_rate),  # 强制转为int类型
-                            stationary=True
-                        )
-                        if reduced_noise.ndim == 1:
-                            reduced_noise = reduced_noise.reshape(-1, 1)
-                        filename = f"{timestamp}-denoise.wav"
-                        # 强制采样率为整数
-                        sf.write(
-                            filename, 
-                            reduced_noise, 
-                            int(self.sample_rate),
-                            subtype='PCM_16'
-                        )
-                    
-                    print(f"已保存录音文件: {filename}")
-                except Exception as e:
-                    print(f"保存录音失败: {e}")
-            self.recording_buffer.clear()
-            print("录音已停止")
+            mm, path, n_samples = self._rec_mm, self._rec_path, self._rec_pos
+            sample_rate = self._rec_sample_rate
+            grow_future, dropped = self._rec_grow_future, self._rec_dropped
+            self._rec_mm = None
+            self._rec_path = None
+        print("录音已停止")
+        if dropped:
+            print(f"录音文件扩容不及时，丢弃了{dropped}个采样点")
+
+        try:
+            # 等待进行中的扩容结束，避免其在截断文件之后再次扩展文件
+            if grow_future is not None:
+                grow_future.result()
+            _close_capture(mm)  # 关闭映射后才能截断文件
+            if n_samples == 0:
+                os.remove(path)
+                return
+            # 写入WAV文件头并截断到实际长度，临时文件直接重命名为最终文件，无需拷贝数据
+            data_bytes = n_samples * 2
+            with open(path, 'r+b') as f:
+                f.write(_wav_header(sample_rate, data_bytes))
+                f.truncate(_WAV_HEADER_BYTES + data_bytes)
+            filename = f"{time.strftime('%H%M%S-%y%m%d')}.wav"
+            os.replace(path, filename)
+            print(f"已保存录音文件: {filename}")
+        except Exception as e:
+            print(f"保存录音失败: {e}")
+            # 删除残留的临时文件，避免.wav.part文件留在工作目录中无人清理
+            try:
+                mm._mmap.close()
+                if os.path.exists(path):
+                    os.remove(path)
+            except Exception as e:
+                print(f"清理录音临时文件失败: {e}")
+            return
+
+        if self.reduce_noise:
+            self._denoise_executor.submit(
+                self._denoise_and_write,
+                filename,
+                f"{os.path.splitext(filename)[0]}-denoise.wav"
+            )
+
+    def _denoise_and_write(self, src_filename: str, dst_filename: str) -> None:
+        """
+        分窗口并行降噪并写入文件
+        相邻窗口重叠denoise_overlap_seconds秒，重叠部分线性交叉淡化拼接
+        :param src_filename: 原始录音文件
+        :param dst_filename: 降噪后的输出文件
+        """
+        try:
+            info = sf.info(src_filename)
+            sample_rate, total = info.samplerate, info.frames
+            window = int(BASE_PARAMS.denoise_window_seconds * sample_rate)
+            overlap = int(BASE_PARAMS.denoise_overlap_seconds * sample_rate)
+            hop = window - overlap
+            starts = range(0, max(total - overlap, 1), hop)
+            # 噪声谱由录音开头的片段估计一次，所有窗口共用
+            noise, _ = sf.read(src_filename, stop=int(BASE_PARAMS.denoise_noise_seconds * sample_rate), dtype='float32')
+            noise_profile = _estimate_noise_profile(noise)
+
+            def denoise_segment(start):
+                # 每个窗口独立读取，FFT计算期间会释放GIL
+                y, _ = sf.read(src_filename, start=start, stop=start + window, dtype='float32')
+                return _denoise_stationary(y, noise_profile)
+
+            fade_in = np.linspace(0.0, 1.0, overlap, dtype=np.float32)
+            tail = None
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool, \
+                    sf.SoundFile(dst_filename, 'w', samplerate=sample_rate,
+                                 channels=1, subtype='PCM_16') as out:
+                for i, segment in enumerate(pool.map(denoise_segment, starts)):
+                    if tail is not None:
+                        n = min(len(tail), len(segment))
+                        segment[:n] = tail[:n] * (1.0 - fade_in[:n]) + segment[:n] * fade_in[:n]
+                    if i == len(starts) - 1:
+                        out.buffer_write(_to_pcm16(segment), dtype='int16')
+                    else:
+                        tail = segment[-overlap:].copy()
+                        out.buffer_write(_to_pcm16(segment[:-overlap]), dtype='int16')
+            print(f"已保存录音文件: {dst_filename}")
+        except Exception as e:
+            print(f"保存降噪录音失败: {e}")
+            return
+        if self.on_denoise_saved is not None:
+            self.on_denoise_saved(dst_filename)
 
     @property
     def is_recording(self) -> bool:
-        """获取当前录音状态"""
-        with self.recording_lock:
-            return self._is_recording
+        """获取当前录音状态（单个bool读取在GIL下是原子的，无需加锁；状态切换仍在锁内进行）"""
+        return self._is_recording
 
     def _start_stream(self, channels: int) -> None:
         """启动音频输入流"""
         self._stop_stream()  # 确保关闭现有连接
         try:
             self.stream = sd.InputStream(
-                samplerate=self.sample_rate,
+                samplerate=self._device_sample_rate,
                 channels=channels,
-                blocksize=self.chunk_size,
+                blocksize=self._device_blocksize,
                 callback=self._audio_callback,
                 dtype='float32'
             )
@@ -235,9 +590,10 @@ class RealtimeAudioProcessor(BaseAudioProcessor):
         self.stream = None
 
     def get_latest_block(self) -> np.ndarray:
-        """获取最新的音频数据块（线程安全）"""
-        with self.lock:
-            return self.audio_blocks[-1] if self.audio_blocks else np.zeros(self.chunk_size)
+        """获取最新的音频数据块（认领该槽位，返回的数组在下次调用前不会被回调改写）"""
+        with self._slot_lock:
+            self._reading = self._latest
+            return self._slots[self._reading]
 
     def get_current_time(self) -> float:
         """获取从开始处理到现在的持续时间"""
@@ -251,11 +607,11 @@ class FileAudioProcessor(BaseAudioProcessor):
     """音频文件处理器（支持循环播放）"""
     def __init__(self):
         super().__init__(
-            default_sample_rate=BASE_PARAMS['default_sample_rate'],
-            default_chunk_size=BASE_PARAMS['chunk_size'],
-            default_n_fft=BASE_PARAMS['n_fft']
+            default_sample_rate=BASE_PARAMS.default_sample_rate,
+            default_chunk_size=BASE_PARAMS.chunk_size,
+            default_n_fft=BASE_PARAMS.n_fft
         )
-        self.audio_blocks = []              # 预分割的音频块列表
+        self.audio_blocks = np.empty((0, self.chunk_size), dtype=np.float32)  # 预分割的音频块（每行一块）
         self.current_frame = 0              # 当前播放位置
         self.stream = None                  # 输出流对象
         self.loop_playback = True           # 循环播放标志
@@ -266,23 +622,34 @@ class FileAudioProcessor(BaseAudioProcessor):
         self.file_path = file_path          # 音频文件路径
         
         try:
-            # 使用librosa加载音频（保持原始采样率）
-            y, original_sample_rate = librosa.load(
-                self.file_path, sr=None, mono=True
-            )
+            ext = os.path.splitext(self.file_path)[1].lower()
+            if ext in ('.wav', '.flac', '.ogg'):
+                # libsndfile可直接解码的格式跳过librosa，直接读取为float32并混为单声道
+                y, original_sample_rate = sf.read(self.file_path, dtype='float32')
+                if y.ndim == 2:
+                    y = y.mean(axis=1)
+            else:
+                # 其他格式（如mp3）使用librosa加载音频（保持原始采样率）
+                y, original_sample_rate = librosa.load(
+                    self.file_path, sr=None, mono=True
+                )
             
             # 如果文件采样率与系统不同，更新参数并通知观察者
             if original_sample_rate != self.sample_rate:
                 self.set_sample_rate(original_sample_rate)
 
-            # 将音频分割为固定大小的块
+            # 将音频分割为固定大小的块：一次性reshape为连续二维数组（每行一块）
             total_frames = len(y)
-            for i in range(0, total_frames, self.chunk_size):
-                chunk = y[i:i+self.chunk_size]
-                if len(chunk) < self.chunk_size:
-                    chunk = np.pad(chunk, (0, self.chunk_size - len(chunk)))
-                self.audio_blocks.append(chunk)
-                
+            n_blocks = -(-total_frames // self.chunk_size)
+            y = np.ascontiguousarray(y, dtype=np.float32)
+            if total_frames % self.chunk_size == 0:
+                # 恰好整块时直接取视图，无需任何拷贝
+                self.audio_blocks = y.reshape(n_blocks, self.chunk_size)
+            else:
+                buf = np.zeros(n_blocks * self.chunk_size, dtype=np.float32)
+                buf[:total_frames] = y
+                self.audio_blocks = buf.reshape(n_blocks, self.chunk_size)
+
             print(f"文件加载完成，总时长：{total_frames/self.sample_rate:.2f}秒")
             self.start_stream()
         except Exception as e:
@@ -295,11 +662,12 @@ class FileAudioProcessor(BaseAudioProcessor):
             try:
                 with self.lock:
                     if self.current_frame < len(self.audio_blocks):
-                        outdata[:] = self.audio_blocks[self.current_frame].reshape(-1, 1)
+                        outdata[:, 0] = self.audio_blocks[self.current_frame]
                         self.current_frame += 1
                         self.data_ready.set()
                     else:
                         if self.loop_playback:
+                            outdata.fill(0)  # 回绕的这一块输出静音，避免重放缓冲区中的残留数据
                             self.current_frame = 0
                             print("循环播放")
                         else:
@@ -322,7 +690,7 @@ class FileAudioProcessor(BaseAudioProcessor):
         """获取当前播放的音频块（带防零处理）"""
         with self.lock:
             if self.current_frame == 0:
-                return np.zeros(self.chunk_size) + 1e-6
+                return silence(self.chunk_size, 1e-6)
             return self.audio_blocks[self.current_frame - 1]
 
     def get_current_time(self) -> float:
@@ -349,6 +717,6 @@ class FileAudioProcessor(BaseAudioProcessor):
         if self.stream and self.stream.active:
             self.stream.stop()
             self.stream.close()
-        self.audio_blocks = []
+        self.audio_blocks = np.empty((0, self.chunk_size), dtype=np.float32)
         self.current_frame = 0
         # print("文件播放器已清理")
\ No newline at end of file
@@ -1,26 +1,42 @@
 # config.py - 存放所有配置参数和常量
-BASE_PARAMS = {
+from dataclasses import dataclass
+from types import MappingProxyType
+
+@dataclass(frozen=True, slots=True)
+class BaseParams:
+    """基础参数（只读，属性访问走slots，开销低于字典查找）"""
     # 设备状态检测间隔（单位：秒），控制检查音频设备插拔的频率
-    'device_check_interval': 2,
+    device_check_interval: float = 2.0
     # 音频采样率（单位：Hz），标准CD音质采样率
-    'default_sample_rate': 44100,
+    default_sample_rate: int = 44100
     # 音频块大小（单位：采样点数），影响实时处理的延迟和计算效率
-    'chunk_size': 2048,
+    chunk_size: int = 2048
     # FFT窗口长度（单位：采样点数），决定频率分辨率（越大分辨率越高）
-    'n_fft': 2048,
+    n_fft: int = 2048
     # 分贝转换参考值，用于librosa.amplitude_to_db()计算相对dB值
-    'ref_value': 1.0,
+    ref_value: float = 1.0
     # 频谱处理范围(Hz)
-    'freq_range': (200, 4000),
+    freq_range: tuple[float, float] = (200.0, 4000.0)
     # 标准音高 (Hz)，可设为440.0或442.0等常用值
-    'reference_pitch': 442.0,
+    reference_pitch: float = 442.0
     # 窗口尺寸
-    'window_size': (1600, 900),
+    window_size: tuple[int, int] = (1600, 900)
     # 图表绘制间隔
-    'render_interval': 1 / 60,
+    render_interval: float = 1 / 60
     # 计算间隔
-    'compute_interval': 1 / 100,
-}
+    compute_interval: float = 1 / 100
+    # 录音数据区预分配时长（单位：秒），超出后自动扩容
+    recording_prealloc_seconds: float = 600.0
+    # 降噪时用于估计噪声谱的录音开头时长（单位：秒）
+    denoise_noise_seconds: float = 0.5
+    # 降噪处理的窗口长度（单位：秒），各窗口在后台线程池中并行降噪
+    denoise_window_seconds: float = 30.0
+    # 相邻降噪窗口的重叠长度（单位：秒），重叠部分交叉淡化拼接
+    denoise_overlap_seconds: float = 1.0
+
+BASE_PARAMS = BaseParams()
+# 频谱处理范围的上下限（Hz）
+FREQ_LO, FREQ_HI = BASE_PARAMS.freq_range
 
 COLORS = {
     'spectrum_curve': 'darkorange',
@@ -33,15 +49,20 @@ COLORS = {
     'melody_reference_line': 'white',
 }
 
-# 频谱曲线层参数
-SPECTRUM_CURVE_LAYER_PARAMS = {
+# 频谱曲线层参数（运行时不修改，以只读映射导出，图层可放心缓存读取结果）
+SPECTRUM_CURVE_LAYER_PARAMS = MappingProxyType({
     'visible': True,                # 是否显示该层
+    'compute_when_hidden': True,    # 隐藏时是否仍计算频谱（峰值层、旋律层依赖频谱数据）
     'zorder': 0,                    # 图层顺序，值越大越上层
     'smoothed_curve': False,        # 是否显示为平滑曲线
     'amplitude_range': (-60, 60),   # 幅度显示范围(dB)
     'line_width': 0.5,              # 线宽
     'alpha': 0.7,                   # 透明度
-}
+})
+
+# 插值频谱数组（形状为(2, len(x_new))）中各行对应的曲线
+INTERP_SMOOTH = 0   # 平滑曲线（三次样条插值）
+INTERP_RAW = 1      # 原始曲线（最近邻插值）
 
 # 峰值层参数
 PEAK_LAYER_PARAMS = {
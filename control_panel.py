@@ -2,7 +2,7 @@
 import os
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QPushButton, 
-    QListWidget, QListWidgetItem, QSlider, QLabel, QCheckBox
+    QListWidget, QSlider, QLabel, QCheckBox
 )
 from PyQt5.QtCore import Qt, pyqtSignal
 from ui_widget.blink_btn import BlinkButton
@@ -21,6 +21,7 @@ class ControlPanel(QWidget):
         super().__init__(parent)
         self._params = {}
         self._bindings = {}
+        self._file_list_mtime = None  # 文件列表对应的目录修改时间
         self._init_ui()
         self.slider_being_controlled = False  # 新增状态标志
         self._connect_internal_signals()
@@ -157,20 +158,31 @@ class ControlPanel(QWidget):
         self.param_changed.emit('slider_value', self.progress_slider.value())
     # 公共接口
     def update_file_list(self):
-        """更新文件列表"""
-        self.file_list.clear()
-        audio_files = [
-            (f, os.path.getctime(f))  # 组成(文件名, 时间戳)元组
-            for f in os.listdir('.')
-            if f.lower().endswith(('.wav', '.mp3', '.ogg'))
-        ]
+        """更新文件列表（目录未变化时跳过重新扫描）"""
+        dir_mtime = os.stat('.').st_mtime_ns
+        if self._file_list_mtime == dir_mtime: return
+        self._file_list_mtime = dir_mtime
+        # scandir的DirEntry自带stat缓存，且先按扩展名过滤再读取时间戳
+        with os.scandir('.') as it:
+            audio_files = [
+                (entry.name, entry.stat().st_ctime)  # 组成(文件名, 时间戳)元组
+                for entry in it
+                if entry.name.lower().endswith(('.wav', '.mp3', '.ogg')) and entry.is_file()
+            ]
 
         # 按时间戳降序排序（新文件在前）
         sorted_files = sorted(audio_files, key=lambda x: x[1], reverse=True)
-        for file_name, _ in sorted_files:
-            item = QListWidgetItem(file_name)
-            item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
-            self.file_list.addItem(item)
+        # 批量填充：暂停重绘与信号，整表只触发一次重新布局
+        self.file_list.setUpdatesEnabled(False)
+        self.file_list.blockSignals(True)
+        try:
+            self.file_list.clear()
+            self.file_list.addItems([file_name for file_name, _ in sorted_files])
+            for i in range(self.file_list.count()):
+                self.file_list.item(i).setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
+        finally:
+            self.file_list.blockSignals(False)
+            self.file_list.setUpdatesEnabled(True)
 
     def set_slider_state(self, enabled, max_value=0):
         """设置进度条状态"""
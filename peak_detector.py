@@ -1,8 +1,26 @@
 # peak_detector.py
 import numpy as np
-from scipy.interpolate import interp1d
 from scipy.signal import find_peaks
-from config import SPECTRUM_CURVE_LAYER_PARAMS, PEAK_LAYER_PARAMS
+from numba import njit
+from config import SPECTRUM_CURVE_LAYER_PARAMS, PEAK_LAYER_PARAMS, INTERP_SMOOTH, INTERP_RAW
+
+@njit(nogil=True, cache=True)
+def _dynamic_filter(heights, offset, threshold):
+    """
+    动态筛选（按频率从高到低的顺序单次遍历）
+    第一个峰值强制保留，之后的峰值需满足：当前分贝值 >= 前一个保留峰值的分贝值 * threshold
+    :return: 与heights等长的布尔掩码
+    """
+    mask = np.zeros(heights.shape[0], dtype=np.bool_)
+    prev_height = 0.0
+    for i in range(heights.shape[0]):
+        h = heights[i] + offset
+        if i == 0 or h >= prev_height * threshold:
+            mask[i] = True
+            prev_height = h
+    return mask
+
+_dynamic_filter(np.zeros(1), 0.0, 1.0)  # 导入时预编译，避免首帧卡顿
 
 class PeakDetector:
     def __init__(self, x_subband, x_new):
@@ -18,9 +36,30 @@ class PeakDetector:
         self.x_subband = x_subband
         self.x_new = x_new
         self.freq_step = x_subband[1] - x_subband[0]  # 频率分辨率
+        self._refresh_params()
+        self._refresh_band()
+
+    def _refresh_params(self):
+        """将检测过程中每帧使用的参数缓存为属性，避免每帧查字典"""
+        self._prominence = PEAK_LAYER_PARAMS['prominence']
+        self._height = PEAK_LAYER_PARAMS['height']
+        self._distance = PEAK_LAYER_PARAMS['distance']
+        self._db_offset = float(PEAK_LAYER_PARAMS['db_offset'])
+        self._dynamic_threshold = float(PEAK_LAYER_PARAMS['dynamic_threshold'])
+        self._min_db = PEAK_LAYER_PARAMS['min_db']
+        self._num = PEAK_LAYER_PARAMS['num']
+        self._display_curve = INTERP_SMOOTH if SPECTRUM_CURVE_LAYER_PARAMS['smoothed_curve'] else INTERP_RAW
+
+    def _refresh_band(self):
+        """根据PEAK_LAYER_PARAMS中的检测频段计算并缓存频段切片（频率轴变化时PeakLayer会重建检测器）"""
+        # x_new单调递增，检测频段对应其中一段连续区间，用切片取视图即可
+        lo = np.searchsorted(self.x_new, PEAK_LAYER_PARAMS['min_freq'], side='left')
+        hi = np.searchsorted(self.x_new, PEAK_LAYER_PARAMS['max_freq'], side='right')
+        self._band = slice(lo, hi)
+        self._valid_x = self.x_new[self._band]
         
     def _parabolic_interpolation(self, sub_idx, db_subband):
-        """抛物线插值计算精确频率"""
+        """抛物线插值计算精确频率（sub_idx可为索引数组，一次计算所有峰值）"""
         y0, y1, y2 = (
             db_subband[sub_idx-1],
             db_subband[sub_idx],
@@ -33,26 +72,24 @@ class PeakDetector:
     def detect_peaks(self, interp_data, db_subband):
         """
         执行峰值检测
-        :param interp_data: 插值后的频谱数据（包含smooth/raw）
+        :param interp_data: 插值后的频谱数据，形状为(2, len(x_new))，各行为平滑/原始曲线
         :param db_subband: 原始子带频谱数据（用于精确计算）
         :return: 排序后的峰值列表 [(freq, dB), ...]
         """
         # 选择数据源
-        data_source = interp_data['raw']
+        data_source = interp_data[INTERP_RAW]
         
-        # 频段筛选
-        freq_mask = (self.x_new >= PEAK_LAYER_PARAMS['min_freq']) & \
-            (self.x_new <= PEAK_LAYER_PARAMS['max_freq'])
-        valid_x = self.x_new[freq_mask]
-        valid_db = data_source[freq_mask]
+        # 频段筛选（使用缓存的频段切片）
+        valid_x = self._valid_x
+        valid_db = data_source[self._band]
 
         # 峰值检测
         try:
             peaks, properties = find_peaks(
                 valid_db,
-                prominence=PEAK_LAYER_PARAMS['prominence'],
-                height=PEAK_LAYER_PARAMS['height'],
-                distance=PEAK_LAYER_PARAMS['distance']
+                prominence=self._prominence,
+                height=self._height,
+                distance=self._distance
             )
         except Exception as e:
             raise RuntimeError(f"Peak detection failed: {str(e)}")
@@ -64,57 +101,46 @@ class PeakDetector:
         
         # 按频率从高到低排序（降序）
         sort_idx = np.argsort(peak_freqs)[::-1]
-        sorted_heights = original_heights[sort_idx]
-        sorted_freqs = peak_freqs[sort_idx]
-        sorted_indices = peak_indices[sort_idx]
-        
-        # 动态筛选（严格比较原始分贝值）
-        filtered_indices = []
-        prev_height = None
+        sorted_heights = np.ascontiguousarray(original_heights[sort_idx], dtype=np.float64)
         
-        for i, (idx, h) in enumerate(zip(sorted_indices, sorted_heights)):
-            h = h + PEAK_LAYER_PARAMS['db_offset']
-            if i == 0:
-                # 第一个峰值强制保留
-                filtered_indices.append(idx)
-                prev_height = h  # 记录原始分贝值
-                continue
-                
-            # 关键逻辑：当前分贝值 >= 前一个峰值的分贝值 * dynamic_threshold
-            if h >= prev_height * PEAK_LAYER_PARAMS['dynamic_threshold']:
-                filtered_indices.append(idx)
-                prev_height = h  # 更新为当前分贝值
-        # 转换回原始peaks索引顺序
-        mask = np.isin(peak_indices, filtered_indices)
-        dynamic_filtered_peaks = peak_indices[mask]
+        # 动态筛选（严格比较原始分贝值），结果按sort_idx散射回原始peaks顺序
+        dynamic_mask = np.empty(len(peak_indices), dtype=bool)
+        dynamic_mask[sort_idx] = _dynamic_filter(
+            sorted_heights,
+            self._db_offset,
+            self._dynamic_threshold
+        )
 
         # 筛选显著峰值
-        valid_mask = (properties["prominences"] > PEAK_LAYER_PARAMS['prominence']) & \
-            (properties["peak_heights"] > PEAK_LAYER_PARAMS['min_db'])
-        valid_mask = valid_mask & np.isin(peaks, dynamic_filtered_peaks)
+        valid_mask = (properties["prominences"] > self._prominence) & \
+            (properties["peak_heights"] > self._min_db)
+        valid_mask = valid_mask & dynamic_mask
         valid_peaks = peaks[valid_mask]
 
-        precise_data = []
-        for peak_idx in valid_peaks:
-            approx_freq = valid_x[peak_idx]
-            nearest_sub = np.argmin(np.abs(self.x_subband - approx_freq))
-            sub_idx = np.clip(nearest_sub, 1, len(self.x_subband)-2)
-            
-            # 计算精确频率
-            precise_freq = self._parabolic_interpolation(sub_idx, db_subband)
-            
-            # 获取显示dB值
-            precise_db = np.interp(
-                precise_freq, 
-                self.x_new, 
-                interp_data['smooth' if SPECTRUM_CURVE_LAYER_PARAMS['smoothed_curve'] else 'raw']
-            )
-            precise_data.append((precise_freq, precise_db))
+        # 子带频率轴等间距，直接换算出最近的子带索引（无需逐峰值扫描整个频率轴）
+        nearest_subs = np.clip(
+            np.rint((valid_x[valid_peaks] - self.x_subband[0]) / self.freq_step).astype(np.intp),
+            1, len(self.x_subband) - 2
+        )
+
+        # 批量计算所有峰值的精确频率
+        precise_freqs = self._parabolic_interpolation(nearest_subs, db_subband)
+        
+        # 获取显示dB值
+        precise_dbs = np.interp(
+            precise_freqs, 
+            self.x_new, 
+            interp_data[self._display_curve]
+        )
 
         # 筛选并排序
-        return self._sort_peaks(precise_data)
+        return self._sort_peaks(precise_freqs, precise_dbs)
     
-    def _sort_peaks(self, peaks):
+    def _sort_peaks(self, freqs, dbs):
         """排序策略：按幅度取前PEAK_LAYER_PARAMS['num']，然后按频率排序"""
-        sorted_by_amplitude = sorted(peaks, key=lambda x: x[1], reverse=True)[:PEAK_LAYER_PARAMS['num']]
-        return sorted(sorted_by_amplitude, key=lambda x: x[0])
\ No newline at end of file
+        k = min(self._num, len(dbs))
+        if k == 0: return []
+        # argpartition线性时间选出幅度最大的k个，只对这k个按频率排序
+        top_k = np.argpartition(dbs, -k)[-k:]
+        top_k = top_k[np.argsort(freqs[top_k])]
+        return list(zip(freqs[top_k].tolist(), dbs[top_k].tolist()))
\ No newline at end of file
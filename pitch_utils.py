@@ -10,6 +10,7 @@ class PitchConverter:
         """
         self.reference = reference
         self.note_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+        self._note_names_arr = np.array(self.note_names, dtype=object)  # 供批量接口按索引取音名
     
     def frequency_to_midi(self, freq):
         """将频率转换为MIDI音符编号（关键修正点）"""
@@ -58,6 +59,26 @@ class PitchConverter:
             print(f"音高计算错误: {str(e)}")
             return ("", 0)
         
+    def get_nearest_pitch_info_batch(self, freqs):
+        """
+        批量获取最近音高信息（与get_nearest_pitch_info逐元素结果一致）
+        :param freqs: 输入频率数组（Hz）
+        :return: (音名数组, 音分差数组)，无效频率对应("", 0)
+        """
+        freqs = np.asarray(freqs, dtype=np.float64)
+        if self.reference <= 0:
+            return np.full(freqs.shape, "", dtype=object), np.zeros(freqs.shape, dtype=np.int64)
+        valid = (freqs >= 20) & (freqs <= 14000)
+        safe = np.where(valid, freqs, self.reference)
+        # 计算最接近的MIDI编号及其标准频率
+        nearest = np.rint(12 * np.log2(safe / self.reference) + 69).astype(np.int64)
+        reference_freqs = self.reference * 2.0 ** ((nearest - 69) / 12.0)
+        cents = np.where(valid, np.rint(1200 * np.log2(safe / reference_freqs)), 0).astype(np.int64)
+        # 生成音名
+        names = np.full(freqs.shape, "", dtype=object)
+        names[valid] = self._note_names_arr[nearest[valid] % 12] + ((nearest[valid] // 12) - 1).astype(str).astype(object)
+        return names, cents
+
     def note_to_freq(self, note_str):
         """
         将音名（如'A4', 'C#3'）转换为对应的频率
@@ -1,35 +1,48 @@
 # qapp.py
 import sys
 import os
-import time
-import threading
-import numpy as np
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QHBoxLayout, QListWidgetItem
 )
-from PyQt5.QtCore import Qt
-from audio_processor import RealtimeAudioProcessor, FileAudioProcessor
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
+from audio_processor import RealtimeAudioProcessor, FileAudioProcessor, silence
 from visualizer.mpl_canvas import MplCanvas
 from control_panel import ControlPanel
 from config import BASE_PARAMS
 
+class ComputeThread(QThread):
+    """计算线程：等待音频数据就绪后执行分析计算"""
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+
+    def run(self):
+        self.window._compute_loop()
+
 class MainWindow(QMainWindow):
+    denoise_saved = pyqtSignal(str)  # 降噪文件已写入（由降噪线程发出，在主线程中刷新文件列表）
+
     def __init__(self):
         super().__init__()
         if len(sys.argv) > 1:  # 文件模式
             self.audio_processor = FileAudioProcessor()
             self.audio_processor.load_audio_file(sys.argv[1])
         else:                  # 实时模式
-            self.audio_processor = RealtimeAudioProcessor()
+            self.audio_processor = self._create_realtime_processor()
         self._init_ui()
         self.canvas.connect_control_panel(self.control_panel)
         self._connect_external_signals()
-        self.compute_interval = BASE_PARAMS['compute_interval']
+        self.compute_interval = BASE_PARAMS.compute_interval
         # 控制参数
         self.processing = True
-        # 创建独立线程
-        self.compute_thread = threading.Thread(target=self._compute_loop)
+        # 计算在独立线程中进行，界面控件只在主线程的定时器中更新
+        self.compute_thread = ComputeThread(self)
         self.compute_thread.start()
+        self.ui_timer = QTimer(self)
+        self.ui_timer.setTimerType(Qt.PreciseTimer)
+        self.ui_timer.setInterval(int(self.compute_interval * 1000))
+        self.ui_timer.timeout.connect(self._tick)
+        self.ui_timer.start()
 
         self.control_panel.set_slider_state(self._is_file_mode, self.audio_processor.get_total_frames() if self._is_file_mode else 0)
         self.control_panel.update_button_state(self._is_file_mode, (not self._is_file_mode) and self.audio_processor.is_recording)
@@ -41,7 +54,7 @@ class MainWindow(QMainWindow):
     def _init_ui(self):
         """初始化界面布局"""
         self.setWindowTitle("Audio Visualizer")
-        self.setGeometry(100, 100, *BASE_PARAMS['window_size'])
+        self.setGeometry(100, 100, *BASE_PARAMS.window_size)
 
         # 主布局分为左右两部分
         main_widget = QWidget()
@@ -71,6 +84,13 @@ class MainWindow(QMainWindow):
         self.control_panel.start_end_record_clicked.connect(self._on_start_end_record_clicked)
         self.control_panel.record_mode_clicked.connect(self._on_record_mode_clicked)
         self.canvas.canvas_changed.connect(self.on_canvas_changed)
+        self.denoise_saved.connect(lambda _: self.control_panel.update_file_list())
+
+    def _create_realtime_processor(self):
+        """创建实时音频处理器，降噪文件写入完成后通过信号通知主线程"""
+        processor = RealtimeAudioProcessor()
+        processor.on_denoise_saved = self.denoise_saved.emit
+        return processor
 
     def update_file_list(self):
         """加载音频文件列表"""
@@ -99,7 +119,7 @@ class MainWindow(QMainWindow):
         print("Record mode clicked")
         if not self._is_file_mode: return
         self.audio_processor.cleanup()
-        self.audio_processor = RealtimeAudioProcessor()
+        self.audio_processor = self._create_realtime_processor()
         self.audio_processor.add_params_observer(self.canvas)
         self.canvas.clean()
         self.control_panel.set_slider_state(False, 0)
@@ -138,33 +158,38 @@ class MainWindow(QMainWindow):
         print(f"Reduce noise: {checked}")
         if not self._is_file_mode: self.audio_processor.reduce_noise = checked
 
+    def _tick(self):
+        """界面定时更新（主线程）"""
+        if not self._is_file_mode: return
+        # 更新进度条
+        current_frame = self.audio_processor.get_current_frame()
+        # 通过控制面板接口更新
+        total_seconds = self.audio_processor.get_total_seconds()
+        if self.control_panel.slider_being_controlled:
+            slider_time = total_seconds / self.audio_processor.get_total_frames() * self.control_panel.progress_slider.value()
+            self.control_panel.update_time_label(slider_time, total_seconds)
+        else:
+            self.control_panel.set_slider_value(current_frame)
+            current_seconds = self.audio_processor.get_current_time()
+            self.control_panel.update_time_label(current_seconds, total_seconds)
+
     def _compute_loop(self):
-        """高频计算循环"""
+        """高频计算循环（在计算线程中运行）"""
         while self.processing:
-            start_time = time.time()
-
-            # 更新进度条
-            if self._is_file_mode:
-                current_frame = self.audio_processor.get_current_frame()
-                # 通过控制面板接口更新
-                total_seconds = self.audio_processor.get_total_seconds()
-                if self.control_panel.slider_being_controlled:
-                    slider_time = total_seconds / self.audio_processor.get_total_frames() * self.control_panel.progress_slider.value()
-                    self.control_panel.update_time_label(slider_time, total_seconds)
-                else:
-                    self.control_panel.set_slider_value(current_frame)
-                    current_seconds = self.audio_processor.get_current_time()
-                    self.control_panel.update_time_label(current_seconds, total_seconds)
-            if self.audio_processor.data_ready.is_set():
-                # 获取并处理数据
-                chunk = self._get_audio_chunk()
-                if chunk is not None:
-                    self.canvas.compute(self.audio_processor.get_current_time(), self._get_audio_chunk())
-                self.audio_processor.data_ready.clear()
-            # 精确控制计算频率
-            elapsed = time.time() - start_time
-            sleep_time = max(0, self.compute_interval - elapsed)
-            time.sleep(sleep_time)
+            # 阻塞等待数据就绪，超时后重新检查（音频处理器可能已切换）
+            audio_processor = self.audio_processor
+            if not audio_processor.data_ready.wait(self.compute_interval):
+                continue
+            audio_processor.data_ready.clear()
+            # 获取并处理数据
+            chunk = self._get_audio_chunk()
+            if chunk is None:
+                continue
+            try:
+                self.canvas.compute(audio_processor.get_current_time(), chunk)
+            except Exception as e:
+                # 单帧计算失败只丢弃该帧，计算线程继续运行
+                print(f"分析计算失败: {str(e)}")
 
     def _get_audio_chunk(self):
         """核心音频数据获取方法"""
@@ -175,11 +200,11 @@ class MainWindow(QMainWindow):
             # 实时音频输入模式
             else:
                 if not self.audio_processor.device_available:
-                    return np.zeros()
+                    return silence(self.audio_processor.chunk_size)
                 chunk = self.audio_processor.get_latest_block()
             # 数据标准化
             if chunk is None:
-                return np.zeros(self.audio_processor.n_fft)
+                return silence(self.audio_processor.n_fft)
             # 统一转换为单声道
             if len(chunk.shape) > 1:
                 chunk = chunk.mean(axis=1)
@@ -187,7 +212,7 @@ class MainWindow(QMainWindow):
             
         except Exception as e:
             print(f"音频数据获取失败: {str(e)}")
-            return np.zeros(self.audio_processor.n_fft)  # 返回静音数据防止崩溃
+            return silence(self.audio_processor.n_fft)  # 返回静音数据防止崩溃
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Left:
@@ -198,7 +223,8 @@ class MainWindow(QMainWindow):
     def clean(self):
         self.canvas.clean()
         self.processing = False
-        self.compute_thread.join()
+        self.ui_timer.stop()
+        self.compute_thread.wait()
         self.audio_processor.cleanup()
         
     def closeEvent(self, event):        
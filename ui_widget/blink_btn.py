@@ -1,13 +1,25 @@
 # ui_widget/blink_btn.py
-from PyQt5.QtCore import QPropertyAnimation, QEasingCurve, pyqtProperty
-from PyQt5.QtGui import QColor
+from PyQt5.QtCore import Qt, QPropertyAnimation, QEasingCurve, pyqtProperty
+from PyQt5.QtGui import QColor, QPainter
 from PyQt5.QtWidgets import QPushButton
 
 class BlinkButton(QPushButton):
     """支持颜色渐变的按钮"""
+    # 静态样式只设置一次，背景色在paintEvent中直接绘制，动画过程中无需重新解析样式表
+    _STYLE = """
+        QPushButton {
+            background-color: transparent;
+            color: white;
+            border: none;
+            padding: 8px 8px;
+        }
+    """
+    _BORDER_RADIUS = 5
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self._blink_color = QColor(255, 255, 255)  # 初始颜色
+        self.setStyleSheet(self._STYLE)
         self.blink_anim = QPropertyAnimation(self, b"blink_color", self)
         self.setup_animation()
 
@@ -22,19 +34,21 @@ class BlinkButton(QPushButton):
 
     def set_blink_color(self, color):
         self._blink_color = color
-        # 动态更新样式
-        self.setStyleSheet(f"""
-            QPushButton {{
-                background-color: rgba({color.red()}, {color.green()}, {color.blue()}, {color.alpha()});
-                color: white;
-                border: none;
-                padding: 8px 8px;
-                border-radius: 5px;
-            }}
-        """)
+        # 只触发重绘，不修改样式表
+        self.update()
 
     blink_color = pyqtProperty(QColor, get_blink_color, set_blink_color)
 
+    def paintEvent(self, event):
+        """先绘制圆角背景，再由QPushButton绘制文字"""
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self._blink_color)
+        painter.drawRoundedRect(self.rect(), self._BORDER_RADIUS, self._BORDER_RADIUS)
+        painter.end()
+        super().paintEvent(event)
+
     def start_blink(self):
         """启动呼吸动画"""
         if self.blink_anim.state() != QPropertyAnimation.Running:
@@ -46,4 +60,4 @@ class BlinkButton(QPushButton):
     def stop_blink(self):
         """停止动画并恢复默认"""
         self.blink_anim.stop()
-        self.set_blink_color(QColor(100, 100, 100))
\ No newline at end of file
+        self.set_blink_color(QColor(100, 100, 100))
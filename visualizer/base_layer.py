@@ -1,5 +1,5 @@
 # visualizer/base_layer.py
-from abc import ABC, ABCMeta, abstractmethod
+from abc import ABCMeta, abstractmethod
 from qtpy.QtCore import QObject, Signal
 
 class ABCQMeta(type(QObject), ABCMeta):  # 合并两个元类
@@ -1,36 +1,171 @@
 # visualizer/melody_layer.py
 import numpy as np
+from numba import njit
+from matplotlib.collections import PolyCollection
 from config import COLORS, MELODY_LAYER_PARAMS, BASE_PARAMS
 from visualizer.base_layer import BaseLayer
 from pitch_utils import PitchConverter
 
+# 所有有效倍频比值（k1/k2，其中k1∈[1,5], k2∈[1,k1]），升序排列供二分查找
+_VALID_RATIOS = np.array(sorted({k1 / k2 for k1 in range(1, 6) for k2 in range(1, k1 + 1)}))
+_VALID_RATIOS.setflags(write=False)  # 全局共享的常量表，禁止修改
+
+# 参考线：隔一个半音绘制一条（奇数半音），宽度为±50音分
+_REF_SEMITONES = np.arange(-47, 49, 2)
+_REF_LOWER_RATIO = 2 ** (-50 / 1200)
+_REF_UPPER_RATIO = 2 ** (50 / 1200)
+
+# 以下内核不开启fastmath：误判状态机用NaN表示"无误判记录"，fastmath会假定不存在NaN而使np.isnan判断失效
+@njit(nogil=True, cache=True)
+def _multiplication_ratio(freq1, freq2, tolerance, ratios):
+    """倍频关系判断（见MelodyLayer.is_frequency_multiplication_relationship），无倍频关系时返回0"""
+    # 排除零频率的情况
+    if freq1 == 0 or freq2 == 0:
+        return 0.0
+    # 确定较大和较小的频率，并计算比值（确保ratio >= 1）
+    if freq1 > freq2:
+        ratio, sign = freq1 / freq2, 1.0
+    else:
+        ratio, sign = freq2 / freq1, -1.0
+    # 最常见的情况：两频率基本相同（比值最接近1且在容忍度内），无需查找
+    if ratio - 1.0 <= tolerance and ratio <= 0.5 * (ratios[0] + ratios[1]):
+        return sign
+    # 最接近的比值只可能是插入点两侧的相邻元素
+    i = np.searchsorted(ratios, ratio)
+    closest_ratio = ratios[min(i, ratios.shape[0] - 1)]
+    if i > 0 and abs(ratio - ratios[i - 1]) <= abs(ratio - closest_ratio):
+        closest_ratio = ratios[i - 1]
+    # 判断是否在容忍度范围内
+    if abs(ratio - closest_ratio) <= tolerance:
+        return sign * closest_ratio
+    return 0.0
+
+@njit(nogil=True, cache=True)
+def _fix_misjudgment(freqs, peak_freq, tolerance, ratios):
+    """从倒数第二个点向前，将与误判起点呈倍频关系的频率还原，遇到同音高的点时结束"""
+    n = freqs.shape[0]
+    for idx in range(n - 2, -1, -1):
+        multiplication = _multiplication_ratio(peak_freq, freqs[idx], tolerance, ratios)
+        if multiplication == 0:
+            continue
+        if abs(multiplication) == 1:
+            # 修复完成
+            break
+        freqs[idx] = freqs[idx] * multiplication if multiplication > 0 else freqs[idx] / abs(multiplication)
+
+@njit(nogil=True, cache=True)
+def _track_misjudgment(times, freqs, current_time, peak_time, peak_freq,
+                       tolerance, ratios, max_duration):
+    """
+    误判状态机：新旋律点加入后更新误判起点，必要时原地修复freqs
+    :param peak_time: 误判起点时间，NaN表示当前不处于误判状态
+    :param peak_freq: 误判起点频率，NaN表示当前不处于误判状态
+    :return: 更新后的(peak_time, peak_freq)
+    """
+    multiplication = _multiplication_ratio(freqs[-2], freqs[-1], tolerance, ratios)
+    if multiplication != 0:
+        if abs(multiplication) != 1:
+            if np.isnan(peak_freq):
+                peak_time = times[-2]
+                peak_freq = freqs[-2]
+            else:
+                # 又回到了异常频率的初始音高，则大概率是误判了
+                regress_multiplication = _multiplication_ratio(peak_freq, freqs[-1], tolerance, ratios)
+                if abs(regress_multiplication) == 1 and freqs.shape[0] >= 3:
+                    _fix_misjudgment(freqs, peak_freq, tolerance, ratios)
+                    peak_time = np.nan
+                    peak_freq = np.nan
+    elif not np.isnan(peak_freq):
+        peak_time = np.nan
+        peak_freq = np.nan
+    # 音高切换的时间大于阈值，则结束误判记录状态
+    if not np.isnan(peak_freq) and current_time - peak_time > max_duration:
+        peak_time = np.nan
+        peak_freq = np.nan
+    return peak_time, peak_freq
+
+# 导入时预编译（旋律点缓冲区的列视图是非连续数组，按该布局编译）
+_track_misjudgment(np.zeros((3, 2))[:, 0], np.ones((3, 2))[:, 1], 0.0, np.nan, np.nan, 0.05, _VALID_RATIOS, 0.2)
+_fix_misjudgment(np.ones((3, 2))[:, 1], 1.0, 0.05, _VALID_RATIOS)
+
 class MelodyLayer(BaseLayer):
     def __init__(self):
         super().__init__()
-        self.times = []
-        self.freqs = []
-        self.volumes = []
+        # 旋律点缓冲区：预分配数组，有效数据位于[_head, _head + _n)区间
+        # 容量按时间窗口内最多可能产生的点数留出余量，使整体移回开头的操作很少发生
+        self._cap = 4 * int(np.ceil(MELODY_LAYER_PARAMS['time_window'] / BASE_PARAMS.compute_interval))
+        self._points = np.empty((self._cap, 2), dtype=np.float64)  # 每行(时间, 频率)，可直接用作散点坐标
+        self._volumes = np.empty(self._cap, dtype=np.float32)
+        self._head = 0
+        self._n = 0
+        self._last_time = None               # 上次处理的时间，时间未推进时跳过本次处理
+        self._refresh_params()
         self.scatter = None
         self.ax = None
         self.time_window = MELODY_LAYER_PARAMS['time_window']
         self.possible_misjudgment_peak_time = None
         self.possible_misjudgment_peak_freq = None
-        self.reference_lines = []
+        self.reference_bands = None          # 所有参考线合并为一个PolyCollection，一次绘制
+        self._ref_band_base = None           # 参考线边界缓存对应的基准频率
+        self._ref_lowers = None
+        self._ref_uppers = None
+        self._ref_visible_key = None         # 已绘制参考线对应的(基准频率, 首条索引, 末条索引)
         self.show_reference = True
         self.redraw_ref_lines = True
         self.dynamic_freq_range = True
-        self.pitch_converter = PitchConverter(reference=BASE_PARAMS['reference_pitch'])
+        self.pitch_converter = PitchConverter(reference=BASE_PARAMS.reference_pitch)
         self.target_ylim_min_midi = self.pitch_converter.frequency_to_midi(MELODY_LAYER_PARAMS['freq_range'][0])
         self.target_ylim_max_midi = self.pitch_converter.frequency_to_midi(MELODY_LAYER_PARAMS['freq_range'][1])
+        self._current_ylim_midi = (self.target_ylim_min_midi, self.target_ylim_max_midi)  # 当前y轴范围（MIDI编号），随set_ylim同步维护
         self.bind_param('show_ref_lines', self.set_show_reference, self.get_show_reference)
         self.bind_param('melody_dynamic_freq_range', self.set_dynamic_freq_range, self.get_dynamic_freq_range)
 
+    def _refresh_params(self):
+        """将process中频繁使用的参数缓存为属性，避免每帧查字典"""
+        self._peak_db_offset = float(MELODY_LAYER_PARAMS['peak_db_offset'])
+        self._main_peak_threshold = float(MELODY_LAYER_PARAMS['main_peak_threshold'])
+        self._mul_tol = float(MELODY_LAYER_PARAMS['multiplication_tolerance'])
+        self._misjudge_max_dur = float(MELODY_LAYER_PARAMS['misjudgment_max_duration'])
+        self._fade_speed = float(MELODY_LAYER_PARAMS['freq_range_fade_speed'])
+        self._freq_range = tuple(MELODY_LAYER_PARAMS['freq_range'])
+
+    def on_audio_params_changed(self, sample_rate, chunk_size, n_fft):
+        """音频参数变化时重新读取图层参数"""
+        self._refresh_params()
+
+    @property
+    def times(self):
+        return self._points[self._head:self._head + self._n, 0]
+
+    @property
+    def freqs(self):
+        return self._points[self._head:self._head + self._n, 1]
+
+    @property
+    def volumes(self):
+        return self._volumes[self._head:self._head + self._n]
+
+    def _push(self, t, freq, volume):
+        """追加一个旋律点，到达缓冲区末尾时将有效数据整体移回开头"""
+        if self._head + self._n == self._cap:
+            if self._n == self._cap:
+                # 缓冲区已满，丢弃最旧的数据点
+                self._head += 1
+                self._n -= 1
+            self._points[:self._n] = self._points[self._head:self._head + self._n]
+            self._volumes[:self._n] = self._volumes[self._head:self._head + self._n]
+            self._head = 0
+        i = self._head + self._n
+        self._points[i] = (t, freq)
+        self._volumes[i] = volume
+        self._n += 1
+
     def initialize(self, fig, position):
         self.ax = fig.add_axes(position, frameon=False)
         self.ax.set_xscale('linear')
         self.ax.set_yscale('log')
         self.ax.set_xlim(-MELODY_LAYER_PARAMS['time_window'], 0)
-        self.ax.set_ylim(self.pitch_converter.midi_to_frequency(self.target_ylim_min_midi), self.pitch_converter.midi_to_frequency(self.target_ylim_max_midi))
+        self._set_ylim_midi(self.target_ylim_min_midi, self.target_ylim_max_midi)
         self.scatter = self.ax.scatter(
             [], [], 
             c=[], 
@@ -42,45 +177,54 @@ class MelodyLayer(BaseLayer):
             s=MELODY_LAYER_PARAMS['point_size'],
             zorder=0
         )
+        # 横向铺满坐标轴（x为坐标轴比例，y为数据坐标），与axhspan一致
+        self.reference_bands = PolyCollection(
+            [],
+            facecolors=COLORS['melody_reference_line'],
+            alpha=MELODY_LAYER_PARAMS['reference_line_alpha'],
+            linewidths=0,
+            zorder=-10,
+            animated=True,
+            transform=self.ax.get_yaxis_transform(),
+        )
+        self.reference_bands.set_visible(self.show_reference)
+        self.ax.add_collection(self.reference_bands, autolim=False)
     def draw_reference_line(self, base_freq=440):
         """带可见性控制的参考线绘制方法"""
         self.redraw_ref_lines = False
-        # 清空旧参考线（避免重复绘制）
-        for line in self.reference_lines:
-            line.remove()
-        self.reference_lines.clear()
-        
-        # 计算半音频率范围
-        semitone_ratios = 2 ** (np.arange(-50, 50.1, 100)/1200)  # ±50音分范围[3,5](@ref)
-        ymin, ymax = self.ax.get_ylim()
+        visible = self._visible_ref_bands(base_freq)
+        self._ref_visible_key = self._ref_bands_key(base_freq, visible)
         
-        for semitone in range(-48, 49):
-            if (semitone%2 == 0): continue
-            # 计算中心频率[1,2](@ref)
-            center_freq = base_freq * (2 ** (semitone/12))
-            
-            # 计算频率边界[3,5](@ref)
-            freq_band = [center_freq * r for r in semitone_ratios]
-            lower_edge = min(freq_band)
-            upper_edge = max(freq_band)
-            if upper_edge < ymin or lower_edge > ymax: continue
-            
-            # 绘制并存储参考线对象[3,5](@ref)
-            ref_line = self.ax.axhspan(lower_edge, upper_edge,
-                color=COLORS['melody_reference_line'], 
-                alpha=MELODY_LAYER_PARAMS['reference_line_alpha'],
-                linewidth=0,
-                zorder=-10,
-                animated=True)
-            ref_line.set_visible(self.show_reference)
-            self.reference_lines.append(ref_line)
+        # 可见参考线一次性生成(M, 4, 2)顶点数组：左下、右下、右上、左上
+        lowers = self._ref_lowers[visible]
+        uppers = self._ref_uppers[visible]
+        verts = np.empty((len(lowers), 4, 2))
+        verts[:, :, 0] = (0, 1, 1, 0)
+        verts[:, 0:2, 1] = lowers[:, None]
+        verts[:, 2:4, 1] = uppers[:, None]
+        self.reference_bands.set_verts(verts)
             
+    def _visible_ref_bands(self, base_freq):
+        """返回当前y轴范围内可见参考线的掩码"""
+        # 各参考线的上下边界（中心频率±50音分），按基准频率缓存
+        if self._ref_band_base != base_freq:
+            centers = base_freq * 2.0 ** (_REF_SEMITONES / 12)
+            self._ref_lowers = centers * _REF_LOWER_RATIO
+            self._ref_uppers = centers * _REF_UPPER_RATIO
+            self._ref_band_base = base_freq
+        ymin, ymax = self.ax.get_ylim()
+        return (self._ref_uppers >= ymin) & (self._ref_lowers <= ymax)
+
+    @staticmethod
+    def _ref_bands_key(base_freq, visible):
+        """可见参考线集合的标识（可见参考线总是连续的一段）"""
+        idx = np.flatnonzero(visible)
+        return (base_freq, int(idx[0]), int(idx[-1])) if len(idx) else (base_freq, -1, -1)
+
     def set_show_reference(self, value):
         if self.show_reference != value:
             self.show_reference = value
-            # 批量设置可见性（比重新绘制更高效）[3,5](@ref)
-            for line in self.reference_lines:
-                line.set_visible(self.show_reference)
+            self.reference_bands.set_visible(self.show_reference)
 
     def get_show_reference(self):
         return self.show_reference
@@ -92,6 +236,7 @@ class MelodyLayer(BaseLayer):
                 self.target_ylim_min_midi = self.pitch_converter.frequency_to_midi(MELODY_LAYER_PARAMS['freq_range'][0])
                 self.target_ylim_max_midi = self.pitch_converter.frequency_to_midi(MELODY_LAYER_PARAMS['freq_range'][1])
                 self.ax.set_ylim(*MELODY_LAYER_PARAMS['freq_range'])
+                self._current_ylim_midi = (self.target_ylim_min_midi, self.target_ylim_max_midi)
                 self.redraw_ref_lines = True
             else:
                 self.calculate_target_ylim()
@@ -105,111 +250,104 @@ class MelodyLayer(BaseLayer):
         volume = data_protocol.volume
         # 过滤无效时间
         if current_time <= 0: return
+        # 时间未推进（如文件暂停时重复取到同一块）则无需重复处理；时间回退（跳转、循环播放）仍需正常处理
+        if current_time == self._last_time: return
+        self._last_time = current_time
+        # 时间回退时旧数据点都在“未来”，直接清空，保证缓冲区内时间单调递增
+        if self._n and self._points[self._head + self._n - 1, 0] > current_time:
+            self._head = 0
+            self._n = 0
 
         # 时间窗口动态调整
         visible_start = current_time - self.time_window
         self.ax.set_xlim(visible_start, current_time)  # 保证最小值
         has_new_melody = False
         # 添加新数据点
-        for i, (freq, db) in enumerate(peaks):
-            # 取频率最低的主峰作为旋律音高
-            if i == len(peaks) - 1 or \
-                (db + MELODY_LAYER_PARAMS['peak_db_offset']) > MELODY_LAYER_PARAMS['main_peak_threshold'] * (peaks[i + 1][1] + MELODY_LAYER_PARAMS['peak_db_offset']):
-                self.times.append(current_time)
-                self.freqs.append(freq)
-                self.volumes.append(volume)
-                has_new_melody = True
-                break
+        if len(peaks):
+            # 取频率最低的主峰作为旋律音高：第一个明显强于下一个峰值的峰值，都不满足时取最后一个
+            dbs = peaks[:, 1] + self._peak_db_offset
+            is_main = np.empty(len(dbs), dtype=bool)
+            is_main[:-1] = dbs[:-1] > self._main_peak_threshold * dbs[1:]
+            is_main[-1] = True
+            i = int(np.argmax(is_main))
+            self._push(current_time, peaks[i, 0], volume)
+            has_new_melody = True
 
         # 限制数据存储量
         outdated = False
         cutoff = current_time - self.time_window
-        valid_indices = [i for i, t in enumerate(self.times) if t >= cutoff and t <= current_time]
-        if valid_indices:
-            start_idx = valid_indices[0]
-            self.times = self.times[start_idx:]
-            self.freqs = self.freqs[start_idx:]
-            self.volumes = self.volumes[start_idx:]
-            if start_idx != 0: outdated = True
-        else:
-            self.times.clear()
-            self.freqs.clear()
-            self.volumes.clear()
+        # 时间单调递增，二分查找第一个落在窗口内的点作为起点
+        start_idx = int(np.searchsorted(self.times, cutoff))
+        if start_idx != 0:
+            self._head += start_idx
+            self._n -= start_idx
+            outdated = self._n > 0
+        if self._n == 0:
+            self._head = 0
 
-        if has_new_melody and len(self.freqs) > 1:
+        if has_new_melody and self._n > 1:
             # 因为可能存在旋律音的倍频被错误判断为旋律的情况，所以需要识别这种错误判断的开始和结束
-            multiplication = self.is_frequency_multiplication_relationship(self.freqs[-2], self.freqs[-1], MELODY_LAYER_PARAMS['multiplication_tolerance'])
-            if multiplication != 0:
-                if abs(multiplication) != 1:
-                    if None == self.possible_misjudgment_peak_freq:
-                        # print(f'misjudgment start, time: {current_time:.1f}, former freq: {self.freqs[-2]:.1f}, current freq: {self.freqs[-1]:.1f}, multiplication: {multiplication}, len: {len(self.freqs)}')
-                        self.possible_misjudgment_peak_time = self.times[-2]
-                        self.possible_misjudgment_peak_freq = self.freqs[-2]
-                    else:
-                        # 又回到了异常频率的初始音高，则大概率是误判了
-                        regress_multiplication = self.is_frequency_multiplication_relationship(self.possible_misjudgment_peak_freq, self.freqs[-1], MELODY_LAYER_PARAMS['multiplication_tolerance'])
-                        if abs(regress_multiplication) == 1:
-                            # print(f'misjudgment end, peak time: {self.possible_misjudgment_peak_time:.1f}, freq: {self.possible_misjudgment_peak_freq:.1f}, duration: {current_time - self.possible_misjudgment_peak_time:.2f}, regress multiplication: {regress_multiplication}, len: {len(self.freqs)}')
-                            self.fix_misjudgment()
-                        # else:
-                            # print(f'misjudgment continue with another freq, time: {current_time:.1f}, freq: {self.freqs[-1]:.1f}, regress multiplication: {regress_multiplication}, len: {len(self.freqs)}')
-                # elif None != self.possible_misjudgment_peak_freq:
-                    # print(f'misjudgment continue, time: {current_time:.1f}, freq: {self.freqs[-1]:.1f}, multiplication: {multiplication}, len: {len(self.freqs)}')
-
-            elif None != self.possible_misjudgment_peak_freq:
-                self.possible_misjudgment_peak_time = None
-                self.possible_misjudgment_peak_freq = None
-                # print('misjudgment false')
             # 音高切换的时间大于阈值，则结束误判记录状态，阈值需要根据实际演奏的乐曲来设定，如果乐曲中没有较短的八度、十二度、十五度的叠音、颤音等装饰音，则可以适当调大阈值
-            if self.possible_misjudgment_peak_freq != None:
-                if current_time - self.possible_misjudgment_peak_time > MELODY_LAYER_PARAMS['misjudgment_max_duration']:
-                    self.possible_misjudgment_peak_time = None
-                    self.possible_misjudgment_peak_freq = None
-                    # print(f'misjudgment timeout, len: {len(self.freqs)}')
+            peak_time, peak_freq = _track_misjudgment(
+                self.times, self.freqs, current_time,
+                np.nan if self.possible_misjudgment_peak_time is None else self.possible_misjudgment_peak_time,
+                np.nan if self.possible_misjudgment_peak_freq is None else self.possible_misjudgment_peak_freq,
+                self._mul_tol, _VALID_RATIOS, self._misjudge_max_dur
+            )
+            self.possible_misjudgment_peak_time = None if np.isnan(peak_time) else peak_time
+            self.possible_misjudgment_peak_freq = None if np.isnan(peak_freq) else peak_freq
 
         if self.dynamic_freq_range:
             # 有新数据或有旧数据过期时需要重新设置 y 轴范围
             if has_new_melody or outdated:
                 self.calculate_target_ylim()
-            current_ylim = self.ax.get_ylim()
-            current_ylim_min_midi = self.pitch_converter.frequency_to_midi(current_ylim[0])
-            current_ylim_max_midi = self.pitch_converter.frequency_to_midi(current_ylim[1])
+            # 直接在MIDI空间比较，范围无需变化时不做任何对数/指数换算
+            current_ylim_min_midi, current_ylim_max_midi = self._current_ylim_midi
             need_reset_ylim = False
             actual_ylim_min_midi = current_ylim_min_midi
             actual_ylim_max_midi = current_ylim_max_midi
             if abs(current_ylim_min_midi - self.target_ylim_min_midi) > 0.2:
                 need_reset_ylim = True
-                actual_ylim_min_midi = current_ylim_min_midi + (self.target_ylim_min_midi - current_ylim_min_midi) * MELODY_LAYER_PARAMS['freq_range_fade_speed']
+                actual_ylim_min_midi = current_ylim_min_midi + (self.target_ylim_min_midi - current_ylim_min_midi) * self._fade_speed
             if abs(current_ylim_max_midi - self.target_ylim_max_midi) > 0.2:
                 need_reset_ylim = True
-                actual_ylim_max_midi = current_ylim_max_midi + (self.target_ylim_max_midi - current_ylim_max_midi) * MELODY_LAYER_PARAMS['freq_range_fade_speed']
+                actual_ylim_max_midi = current_ylim_max_midi + (self.target_ylim_max_midi - current_ylim_max_midi) * self._fade_speed
             if need_reset_ylim:
-                self.ax.set_ylim(self.pitch_converter.midi_to_frequency(actual_ylim_min_midi), self.pitch_converter.midi_to_frequency(actual_ylim_max_midi))
-                self.redraw_ref_lines = True
+                self._set_ylim_midi(actual_ylim_min_midi, actual_ylim_max_midi)
+                # 渐变时y轴每帧只移动很小的距离，只有可见参考线集合变化时才重建
+                base_freq = BASE_PARAMS.reference_pitch
+                if self._ref_bands_key(base_freq, self._visible_ref_bands(base_freq)) != self._ref_visible_key:
+                    self.redraw_ref_lines = True
+
+    def _set_ylim_midi(self, min_midi, max_midi):
+        """按MIDI编号设置y轴范围，并记录当前范围供下一帧比较"""
+        self.ax.set_ylim(self.pitch_converter.midi_to_frequency(min_midi), self.pitch_converter.midi_to_frequency(max_midi))
+        self._current_ylim_midi = (min_midi, max_midi)
+
     def calculate_target_ylim(self):
-        min_freq = max(min(self.freqs), MELODY_LAYER_PARAMS['freq_range'][0])
-        max_freq = min(max(self.freqs), MELODY_LAYER_PARAMS['freq_range'][1])
-        self.target_ylim_min_midi = int(round(self.pitch_converter.frequency_to_midi(min_freq))) - 8
-        self.target_ylim_max_midi = int(round(self.pitch_converter.frequency_to_midi(max_freq))) + 4
+        freqs = self.freqs
+        min_freq = max(freqs.min(), self._freq_range[0])
+        max_freq = min(freqs.max(), self._freq_range[1])
+        # 两端频率一次性换算为MIDI编号
+        min_midi, max_midi = 12 * np.log2(np.array((min_freq, max_freq)) / self.pitch_converter.reference) + 69
+        self.target_ylim_min_midi = int(round(min_midi)) - 8
+        self.target_ylim_max_midi = int(round(max_midi)) + 4
     def draw(self, data_protocol):
         if not MELODY_LAYER_PARAMS['visible']: return []
         # 更新图形数据
-        if self.times:
-            self.scatter.set_offsets(np.column_stack([self.times, self.freqs]))
-            self.scatter.set_array(np.array(self.volumes))
-        else:
-            self.scatter.set_offsets(np.empty((0, 2)))
-            self.scatter.set_array(np.array([]))
+        # 直接传入缓冲区视图（无数据时为空切片），每帧不再新建数组
+        self.scatter.set_offsets(self._points[self._head:self._head + self._n])
+        self.scatter.set_array(self.volumes)
 
         if self.redraw_ref_lines:
-            self.draw_reference_line(BASE_PARAMS['reference_pitch'])
+            self.draw_reference_line(BASE_PARAMS.reference_pitch)
 
-        return [self.scatter] + self.reference_lines
+        return [self.scatter, self.reference_bands]
     
     def clean(self):
-        self.times = []
-        self.freqs = []
-        self.volumes = []
+        self._head = 0
+        self._n = 0
+        self._last_time = None
 
     def is_frequency_multiplication_relationship(self, freq1, freq2, tolerance):
         """
@@ -219,56 +357,15 @@ class MelodyLayer(BaseLayer):
         :param tolerance: 容忍度，允许的频率比值的误差范围
         :return: 若存在倍频关系，返回符号化的比值（绝对值≥1，正负号表示大小关系）；否则返回0
         """
-        # 排除零频率的情况
-        if freq1 == 0 or freq2 == 0:
-            return 0
-
-        # 确定较大和较小的频率，并计算比值（确保ratio >= 1）
-        larger, smaller = (freq1, freq2) if freq1 > freq2 else (freq2, freq1)
-        ratio = larger / smaller
-
-        # 预生成所有有效比值集合（k1/k2，其中k1∈[1,5], k2∈[1,k1]）
-        valid_ratios = set()
-        for k1 in range(1, 6):
-            for k2 in range(1, k1 + 1):
-                valid_ratios.add(k1 / k2)
+        return _multiplication_ratio(float(freq1), float(freq2), tolerance, _VALID_RATIOS)
 
-        # 寻找最接近的有效比值
-        closest_ratio = None
-        min_diff = float('inf')
-        for candidate in valid_ratios:
-            current_diff = abs(ratio - candidate)
-            if current_diff < min_diff:
-                min_diff = current_diff
-                closest_ratio = candidate
-
-        # 判断是否在容忍度范围内
-        if min_diff <= tolerance:
-            # 根据原始顺序确定符号
-            sign = 1 if freq1 > freq2 else -1
-            return sign * closest_ratio
-        else:
-            return 0
     def fix_misjudgment(self):
         """
         修复误判的旋律音
         """
-        if self.possible_misjudgment_peak_freq == None or len(self.freqs) < 3:
+        if self.possible_misjudgment_peak_freq == None or self._n < 3:
             return
-        for i in range(0, len(self.freqs)):
-            freq = self.freqs[-i-2]
-            time = self.times[-i-2]
-            multiplication = self.is_frequency_multiplication_relationship(self.possible_misjudgment_peak_freq, freq, MELODY_LAYER_PARAMS['multiplication_tolerance'])
-            if multiplication == 0:
-                # print(f'warning: try to fix non multiplication relationship data, time: {time:.1f}, freq: {freq:.1f}, len: {len(self.freqs)}')
-                continue
-            if abs(multiplication) == 1:
-                # 修复完成
-                # print(f'fix done, total point fixed: {i}')
-                break
-            else:
-                fixed = freq * multiplication if multiplication > 0 else freq / abs(multiplication)
-                # print(f'fixing, time: {time:.1f}, freq: {freq:.1f}, multiplication: {multiplication:.1f}, fixed: {fixed:.1f}')
-                self.freqs[-i-2] = fixed
+        _fix_misjudgment(self.freqs, self.possible_misjudgment_peak_freq,
+                         self._mul_tol, _VALID_RATIOS)
         self.possible_misjudgment_peak_time = None
-        self.possible_misjudgment_peak_freq = None
\ No newline at end of file
+        self.possible_misjudgment_peak_freq = None
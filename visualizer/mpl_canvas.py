@@ -1,6 +1,6 @@
 # mpl_canvas.py
 import time
-from collections import deque
+import threading
 import numpy as np
 from matplotlib.figure import Figure
 from matplotlib.animation import FuncAnimation
@@ -12,33 +12,55 @@ from visualizer.peak_layer import PeakLayer
 from visualizer.melody_layer import MelodyLayer
 from config import BASE_PARAMS
 
+_NO_PEAKS = np.empty((0, 2))
+_NO_PEAKS.flags.writeable = False
+
 class DataProtocol:
+    # 固定字段，实例不带__dict__；写入未声明的字段会直接抛出AttributeError
+    __slots__ = ('x_subband', 'x_new', 'spectrum', 'volume', 'peaks', 'peak_note_names', 'current_time', 'artists',
+                 'buffers')
+
     def __init__(self):
+        # 属于该数据槽的输出缓冲区（按图层名存放，reset时保留）：
+        # 图层把每帧结果写入当前槽位自己的缓冲区，槽位被渲染线程认领期间不会被改写
+        self.buffers = {}
+        self.reset()
+
+    def reset(self):
+        """恢复各字段默认值，供复用的数据槽在每帧计算前调用"""
         self.x_subband = None   # 频率子带轴
         self.x_new = None       # 插值后的频率轴
-        self.spectrum = None    # 频谱数据 (interp_data, db_subband)
+        self.spectrum = None    # 频谱数据 (interp_data, db_subband)，interp_data形状为(2, len(x_new))
         self.volume = -np.inf   # 总体音量
-        self.peaks = []         # 峰值数据
+        self.peaks = _NO_PEAKS  # 峰值数据，每行(freq, dB)
+        self.peak_note_names = ()  # 峰值对应的音名，由PeakLayer.process批量计算，draw直接复用
         self.current_time = 0.0 # 当前时间
         self.artists = []
 
     def update(self, **kwargs):
-        """安全更新数据字段"""
+        """更新数据字段（字段名由__slots__约束）"""
         for key, value in kwargs.items():
-            if not hasattr(self, key):
-                raise AttributeError(f"'DataProtocol' 没有字段 '{key}'")
             setattr(self, key, value)
 class MplCanvas(FigureCanvas):
     """自定义Matplotlib画布"""
     canvas_changed = pyqtSignal(str, object)
     def __init__(self, parent=None):
         self._param_bindings = {}
-        self.data_buffer = deque(maxlen=3)  # 缓冲最近3帧数据
+        # 三缓冲：计算线程写入既非最新帧、也非正在渲染帧的槽位，写完后发布槽位索引
+        # 渲染线程只读取最新发布的槽位，不必每帧新建DataProtocol
+        # 选取写入槽位、发布槽位、认领读取槽位都在_slot_lock内完成（只交换索引，持锁时间极短），
+        # 避免计算线程在渲染线程读取_latest与写入_reading之间选中即将被读取的槽位
+        self._slots = [DataProtocol() for _ in range(3)]
+        self._slot_lock = threading.Lock()
+        self._latest = -1   # 最新完成计算的槽位，-1表示暂无数据
+        self._reading = -1  # 渲染线程正在读取的槽位
+        self._seq = 0       # 已发布的帧序号
+        self._drawn_seq = 0 # 已渲染的帧序号
         self.latest_artists = []
         self.fig = Figure(facecolor='black')
         pos = [0, 0, 1, 1]
         super().__init__(self.fig)
-        self.render_interval = BASE_PARAMS['render_interval']
+        self.render_interval = BASE_PARAMS.render_interval
         self.layers = [SpectrumCurveLayer(), PeakLayer(), MelodyLayer()]
         for layer in self.layers:
             layer.initialize(self.fig, pos)  # 使用独立坐标轴
@@ -77,18 +99,29 @@ class MplCanvas(FigureCanvas):
         self.parent().window().on_canvas_changed.update_control(param_path, value)
 
     def compute(self, current_time, chunk):
-        data = DataProtocol()
+        with self._slot_lock:
+            w = next(i for i in range(3) if i != self._latest and i != self._reading)
+        data = self._slots[w]
+        data.reset()
         data.update(current_time=current_time)
         for layer in self.layers:
             layer.process(chunk, data)
-        self.data_buffer.append(data)
+        with self._slot_lock:
+            self._latest = w  # 发布槽位
+            self._seq += 1
 
     def update_plot(self, frame):
         """低频渲染更新（消费者）"""
         try:
-            # 获取最新数据
-            if self.data_buffer:
-                data = self.data_buffer.pop()
+            # 获取最新数据，没有新帧时沿用上次的绘图元素
+            data = None
+            with self._slot_lock:
+                if self._seq != self._drawn_seq and self._latest >= 0:
+                    # 认领最新槽位，此后计算线程不会再选中它写入
+                    self._reading = self._latest
+                    self._drawn_seq = self._seq
+                    data = self._slots[self._reading]
+            if data is not None:
                 artists = []
                 for layer in self.layers:
                     a = layer.draw(data)
@@ -116,7 +149,9 @@ class MplCanvas(FigureCanvas):
         plt.show()
 
     def clean(self):
-        self.data_buffer.clear()
+        with self._slot_lock:
+            self._latest = -1
+            self._drawn_seq = self._seq
         for layer in self.layers:
             layer.clean()
 
@@ -1,6 +1,5 @@
 # visualizer/peak_layer.py
 import numpy as np
-from collections import defaultdict
 from matplotlib import patheffects
 from peak_detector import PeakDetector
 from pitch_utils import PitchConverter
@@ -12,10 +11,26 @@ class PeakLayer(BaseLayer):
         super().__init__()
         """接收频率轴参数"""
         self.detector = None
-        self.pitch_converter = PitchConverter(reference=BASE_PARAMS['reference_pitch'])
-        self.artifacts = {'lines': [], 'texts': []}
+        self.pitch_converter = PitchConverter(reference=BASE_PARAMS.reference_pitch)
+        self._vlines = []       # 频率竖线（预分配，逐帧更新数据与可见性）
+        self._texts = []        # 文本标注
+        self._cents_lines = []  # 音分横线
+        self._artists = []
         self.ax = None
-        self.cache = []  # 新增缓存，存储格式: [{'freq': float, 'note_name': str, 'timestamp': float}]
+        # 去抖动缓存：三个平行数组，有效数据位于[_head, _head + _n)区间
+        # 音名编码为整数编号（无效音名为-1），便于用bincount分组求平均
+        self._cache_cap = 4 * PEAK_LAYER_PARAMS['num'] * int(
+            np.ceil(PEAK_LAYER_PARAMS['untishake_time_threshold'] / BASE_PARAMS.compute_interval))
+        self._freq_cache = np.empty(self._cache_cap, dtype=np.float64)
+        self._ts_cache = np.empty(self._cache_cap, dtype=np.float64)
+        self._note_idx_cache = np.empty(self._cache_cap, dtype=np.int64)
+        self._head = 0
+        self._n = 0
+        self._note_ids = {}  # 音名 -> 整数编号
+
+    def on_audio_params_changed(self, sample_rate, chunk_size, n_fft):
+        """音频参数变化后频率轴随之改变，下一帧重新创建检测器"""
+        self.detector = None
 
     def initialize(self, fig, position):
         """初始化图层"""
@@ -23,10 +38,53 @@ class PeakLayer(BaseLayer):
         self.ax = fig.add_axes(position, frameon=False)
         self.ax.set_xscale('log')
         self.ax.set_yscale('linear')
-        self.ax.set_xlim(*BASE_PARAMS['freq_range'])
+        self.ax.set_xlim(*BASE_PARAMS.freq_range)
         self.ymax = 100
         self.ax.set_ylim((0,self.ymax))
         self.line, = self.ax.plot([], [], color=COLORS['spectrum_curve'], lw=1.2, alpha=0.8)
+        self._init_artist_pool(PEAK_LAYER_PARAMS['num'])
+
+    def _init_artist_pool(self, size):
+        """预分配每个峰值使用的绘图元素，绘制时只更新数据，不再反复创建和移除"""
+        for _ in range(size):
+            vline, = self.ax.plot(
+                [], [],
+                color=COLORS['peaks_line'],
+                linewidth=1.2,
+                alpha=0.8,
+                linestyle='--',
+                zorder = PEAK_LAYER_PARAMS['zorder'],
+                visible=False,
+            )
+            text = self.ax.text(
+                0, 0, '',
+                color=COLORS['peaks_hint_text'],
+                fontsize=PEAK_LAYER_PARAMS['text_fontsize'],
+                ha='left',
+                va='bottom',
+                bbox=dict(
+                    facecolor=COLORS['peaks_hint_text_box'],
+                    alpha=PEAK_LAYER_PARAMS['text_box_alpha'],
+                    edgecolor='none',
+                    pad=1
+                ),
+                path_effects=[
+                    patheffects.withStroke(linewidth=1.5, foreground="black")],
+                zorder = PEAK_LAYER_PARAMS['zorder'],
+                visible=False,
+            )
+            cents_line, = self.ax.plot(
+                [], [],
+                linewidth=PEAK_LAYER_PARAMS['deviation_linewidth'],
+                alpha=PEAK_LAYER_PARAMS['deviation_alpha'],
+                solid_capstyle='butt',
+                zorder = PEAK_LAYER_PARAMS['zorder'],
+                visible=False,
+            )
+            self._vlines.append(vline)
+            self._texts.append(text)
+            self._cents_lines.append(cents_line)
+        self._artists = self._vlines + self._cents_lines + self._texts
         
     def process(self, chunk, data_protocol):
         """
@@ -39,10 +97,15 @@ class PeakLayer(BaseLayer):
             (data_protocol.volume is None):
             return []
         current_time = data_protocol.current_time
-        # 清理过期缓存（保留最近N秒的数据）
+        # 时间回退（如文件跳转）时清空缓存，保证时间戳单调递增
+        if self._n and self._ts_cache[self._head + self._n - 1] > current_time:
+            self._head = 0
+            self._n = 0
+        # 清理过期缓存（保留最近N秒的数据），时间戳单调递增，二分查找起点即可
         cache_threshold = current_time - PEAK_LAYER_PARAMS['untishake_time_threshold']
-        self.cache = [entry for entry in self.cache if entry['timestamp'] >= cache_threshold]
-        len2 = len(self.cache)
+        start = int(np.searchsorted(self._ts_cache[self._head:self._head + self._n], cache_threshold))
+        self._head += start
+        self._n -= start
         
         # 音量阈值检查
         if data_protocol.volume < PEAK_LAYER_PARAMS['volume_threshold']:
@@ -57,100 +120,110 @@ class PeakLayer(BaseLayer):
         # 获取频谱数据
         interp_data, db_subband = data_protocol.spectrum
         try:
-            peaks = self.detector.detect_peaks(interp_data, db_subband)
+            peaks = np.asarray(self.detector.detect_peaks(interp_data, db_subband), dtype=np.float64).reshape(-1, 2)
+            freqs = peaks[:, 0]
+            note_names, _ = self.pitch_converter.get_nearest_pitch_info_batch(freqs)
             data_protocol.update(
-                peaks=peaks
+                peaks=peaks,
+                peak_note_names=note_names
             )
-
-            for freq, _ in peaks:
-                note_name, _ = self.pitch_converter.get_nearest_pitch_info(freq)
-                self.cache.append({
-                    'freq': freq,
-                    'note_name': note_name,
-                    'timestamp': current_time
-                })
+            note_idx = [self._note_id(note_name) for note_name in note_names]
+            self._push_cache(freqs, current_time, note_idx)
         except Exception as e:
             print(f"峰值计算失败: {str(e)}")
 
+    def _note_id(self, note_name):
+        """音名转整数编号，无效音名返回-1"""
+        if not note_name:
+            return -1
+        return self._note_ids.setdefault(note_name, len(self._note_ids))
+
+    def _push_cache(self, freqs, timestamp, note_idx):
+        """批量追加缓存条目，到达缓冲区末尾时将有效数据整体移回开头"""
+        count = min(len(freqs), self._cache_cap)
+        if self._head + self._n + count > self._cache_cap:
+            # 空间不足时丢弃最旧的数据
+            drop = max(0, self._n + count - self._cache_cap)
+            self._head += drop
+            self._n -= drop
+            end = self._head + self._n
+            self._freq_cache[:self._n] = self._freq_cache[self._head:end]
+            self._ts_cache[:self._n] = self._ts_cache[self._head:end]
+            self._note_idx_cache[:self._n] = self._note_idx_cache[self._head:end]
+            self._head = 0
+        i = self._head + self._n
+        self._freq_cache[i:i + count] = freqs[:count]
+        self._ts_cache[i:i + count] = timestamp
+        self._note_idx_cache[i:i + count] = note_idx[:count]
+        self._n += count
+
+    def _note_average_freqs(self):
+        """按音名编号分组，返回(各编号平均频率, 各编号样本数)"""
+        head, n = self._head, self._n
+        note_idx = self._note_idx_cache[head:head + n]
+        valid = note_idx >= 0
+        size = len(self._note_ids)
+        counts = np.bincount(note_idx[valid], minlength=size)
+        sums = np.bincount(note_idx[valid], weights=self._freq_cache[head:head + n][valid], minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / counts, counts
+
     def draw(self, data_protocol):
         """绘制峰值"""
         # 绘制标注
         if not PEAK_LAYER_PARAMS['visible']: return []
-        self._clear_artifacts()
         # 按音名分组并计算平均频率
-        note_groups = defaultdict(list)
-        for entry in self.cache:
-            if entry['note_name']:  # 过滤无效音名
-                note_groups[entry['note_name']].append(entry['freq'])
-        for i, (freq, _) in enumerate(data_protocol.peaks):
-            # 获取音高信息
-            note_name, _ = self.pitch_converter.get_nearest_pitch_info(freq)
-            if not note_name or note_name not in note_groups.keys():
-                average_freq = freq
-            else:
-                average_freq = np.mean(note_groups[note_name])
-            # if i == 0: print(f'freq delta between cache and peaks: {freq - average_freq:.1f}, cache cnt: {len(note_groups[note_name])},\n\t freq: {freq:.1f}, average_freq: {average_freq:.1f}, note_name: {note_name}')
-            _, cents = self.pitch_converter.get_nearest_pitch_info(average_freq)
-            # 绘制频率竖线
-            self._draw_vertical_line(average_freq)
-            # 绘制文本标注
-            self._draw_text_label(average_freq, note_name, cents, i)
-            # 绘制音分横线
+        means, counts = self._note_average_freqs()
+        # 音名已在process中批量计算
+        freqs = data_protocol.peaks[:, 0]
+        note_names = data_protocol.peak_note_names
+        # 有缓存样本的音名取平均频率（单样本时平均值即其本身），否则沿用当前频率
+        note_idx = np.array([self._note_ids.get(note_name, -1) if note_name else -1 for note_name in note_names], dtype=np.int64)
+        has_avg = (note_idx >= 0) & (note_idx < len(counts))
+        has_avg[has_avg] = counts[note_idx[has_avg]] > 0
+        average_freqs = np.where(has_avg, means[np.where(has_avg, note_idx, 0)] if len(means) else freqs, freqs)
+        _, cents_list = self.pitch_converter.get_nearest_pitch_info_batch(average_freqs)
+        n = min(len(average_freqs), len(self._vlines))
+        for i in range(n):
+            average_freq, note_name, cents = average_freqs[i], note_names[i], cents_list[i]
+            # 更新频率竖线
+            self._update_vertical_line(i, average_freq)
+            # 更新文本标注
+            self._update_text_label(i, average_freq, note_name, cents)
+            # 更新音分横线
             if note_name and abs(cents) >= 1:
-                self._draw_cents_line(average_freq, cents)
+                self._update_cents_line(i, average_freq, cents)
+            else:
+                self._cents_lines[i].set_visible(False)
+        # 隐藏本帧未用到的绘图元素
+        for i in range(n, len(self._vlines)):
+            self._vlines[i].set_visible(False)
+            self._texts[i].set_visible(False)
+            self._cents_lines[i].set_visible(False)
 
-        return self.artifacts['lines'] + self.artifacts['texts']
-            
-    def _clear_artifacts(self):
-        """清除旧的绘图元素"""
-        for artist in self.artifacts['lines'] + self.artifacts['texts']:
-            if artist:
-                artist.remove()
-        self.artifacts = {'lines': [], 'texts': []}
+        return self._artists
 
-    def _draw_vertical_line(self, freq):
-        """绘制频率竖线"""
-        vline = self.ax.vlines(
-            x=freq,
-            ymin=0,
-            ymax=self.ymax,
-            colors=COLORS['peaks_line'],
-            linewidth=1.2,
-            alpha=0.8,
-            linestyle='--',
-            zorder = PEAK_LAYER_PARAMS['zorder'],
-        )
-        self.artifacts['lines'].append(vline)
+    def _update_vertical_line(self, index, freq):
+        """更新频率竖线"""
+        vline = self._vlines[index]
+        vline.set_data([freq, freq], [0, self.ymax])
+        vline.set_visible(True)
 
-    def _draw_text_label(self, freq, note_name, cents, index):
-        """绘制文本标注"""
+    def _update_text_label(self, index, freq, note_name, cents):
+        """更新文本标注"""
         text_line1 = f"{freq:.1f} Hz"
         text_line2 = f"{note_name} {int(cents):+d}" if note_name else ""
         
         # 动态计算文本位置
         text_x = freq * (1 + PEAK_LAYER_PARAMS['text_x_offset'])
         text_y = PEAK_LAYER_PARAMS['text_y_offset'] + (PEAK_LAYER_PARAMS['text_fontsize'] * 0.65) * (index % 2)
-        text = self.ax.text(
-            text_x, text_y,
-            f"{text_line1}\n{text_line2}",
-            color=COLORS['peaks_hint_text'],
-            fontsize=PEAK_LAYER_PARAMS['text_fontsize'],
-            ha='left',
-            va='bottom',
-            bbox=dict(
-                facecolor=COLORS['peaks_hint_text_box'],
-                alpha=PEAK_LAYER_PARAMS['text_box_alpha'],
-                edgecolor='none',
-                pad=1
-            ),
-            path_effects=[
-                patheffects.withStroke(linewidth=1.5, foreground="black")],
-            zorder = PEAK_LAYER_PARAMS['zorder'],
-        )
-        self.artifacts['texts'].append(text)
+        text = self._texts[index]
+        text.set_position((text_x, text_y))
+        text.set_text(f"{text_line1}\n{text_line2}")
+        text.set_visible(True)
 
-    def _draw_cents_line(self, freq, cents):
-        """绘制音分偏差横线"""
+    def _update_cents_line(self, index, freq, cents):
+        """更新音分偏差横线"""
         # 计算线宽
         cent_abs = min(abs(cents), PEAK_LAYER_PARAMS['deviation_max_cent'])
         width_ratio = cent_abs / PEAK_LAYER_PARAMS['deviation_max_cent']
@@ -165,17 +238,13 @@ class PeakLayer(BaseLayer):
             x_start = freq / (1 + line_width * 0.001)
             color = COLORS['peaks_cents_below']
         
-        # 绘制横线
-        hline = self.ax.hlines(
-            y=0,
-            xmin=x_start,
-            xmax=x_end,
-            colors=color,
-            linewidth=PEAK_LAYER_PARAMS['deviation_linewidth'],
-            alpha=PEAK_LAYER_PARAMS['deviation_alpha'],
-            zorder = PEAK_LAYER_PARAMS['zorder']
-        )
-        self.artifacts['lines'].append(hline)
+        hline = self._cents_lines[index]
+        hline.set_data([x_start, x_end], [0, 0])
+        hline.set_color(color)
+        hline.set_visible(True)
 
     def clean(self):
-        self.cache = []
\ No newline at end of file
+        self._head = 0
+        self._n = 0
+        for artist in self._artists:
+            artist.set_visible(False)
\ No newline at end of file
@@ -1,22 +1,110 @@
 # visualizer/spectrum_layer.py
+import math
 import numpy as np
 import librosa
-from scipy.interpolate import interp1d
-from config import SPECTRUM_CURVE_LAYER_PARAMS, BASE_PARAMS, COLORS
+from numba import njit
+from scipy.interpolate import CubicSpline
+from scipy.signal import get_window
+try:
+    import pyfftw  # 可选依赖，安装后使用预先规划的FFTW变换
+except ImportError:
+    pyfftw = None
+from config import SPECTRUM_CURVE_LAYER_PARAMS, BASE_PARAMS, COLORS, INTERP_SMOOTH, INTERP_RAW, FREQ_LO, FREQ_HI
 from visualizer.base_layer import BaseLayer
 
+@njit(nogil=True, cache=True, fastmath=True)
+def _subband_db(fft_out, lo, hi, ref_db, out, amin=1e-5, top_db=80.0):
+    """
+    FFT结果 -> 子带dB谱，与librosa.amplitude_to_db(np.abs(fft_out), ref)[lo:hi]结果相同
+    :param ref_db: 参考值对应的dB，即20*log10(max(amin, ref))
+    幅度、功率与全频段dB谱均不生成中间数组；top_db截断以全频段最大值为基准
+    """
+    amin2 = amin * amin
+    max_power = amin2
+    for i in range(fft_out.shape[0]):
+        c = fft_out[i]
+        p = c.real * c.real + c.imag * c.imag
+        if p > max_power:
+            max_power = p
+    floor_db = 10.0 * np.log10(max_power) - ref_db - top_db
+    for j in range(hi - lo):
+        c = fft_out[lo + j]
+        p = max(c.real * c.real + c.imag * c.imag, amin2)
+        out[j] = max(10.0 * np.log10(p) - ref_db, floor_db)
+
+# 导入时预编译（float32帧的FFT结果为complex64，输出为float32）
+_subband_db(np.zeros(4, dtype=np.complex64), 1, 3, 0.0, np.empty(2, dtype=np.float32))
+
+# 插值频率轴点数：峰值检测在该网格上进行（distance等参数以网格点为单位），不随窗口大小改变
+_GRID_SIZE = 2000
+# 绘制曲线时的点数范围，实际点数取坐标轴像素宽度
+_DISPLAY_POINTS_RANGE = (256, 1024)
+
+class _FreqAxis:
+    """频谱图层的频率轴及其派生的预计算数据（只在构造时写入，帧缓冲区的零值位置除外）"""
+    __slots__ = ('x_subband', 'x_new', 'subband_lo', 'subband_hi', 'window', 'frame_buf', 'fft_out', 'fft',
+                 'zero_from', 'nn_idx', 'out_of_range', 'smooth_weights')
+
+    def __init__(self, sample_rate, n_fft):
+        freqs = librosa.fft_frequencies(sr=sample_rate, n_fft=n_fft)
+        freq_mask = (freqs >= FREQ_LO) & (freqs <= FREQ_HI)
+        self.x_subband = freqs[freq_mask]
+        # 插值矩阵与最近邻索引都在此一次性构建，这里检查频率轴，每帧计算时不再需要异常处理
+        if self.x_subband.size < 4 or not np.all(np.isfinite(self.x_subband)) or np.any(np.diff(self.x_subband) <= 0):
+            raise ValueError(f"频谱处理范围({FREQ_LO}, {FREQ_HI})内的频点不足或无效（采样率{sample_rate}，n_fft={n_fft}）")
+        # 频率轴单调递增，子带是一段连续的频点，用切片边界代替布尔掩码
+        self.subband_lo = int(np.argmax(freq_mask))
+        self.subband_hi = self.subband_lo + len(self.x_subband)
+        # 单帧FFT用的窗函数（与librosa.stft默认的周期hann窗一致）与帧缓冲区
+        self.window = get_window('hann', n_fft).astype(np.float32)
+        self.fft = None
+        if pyfftw is not None:
+            # n_fft固定后只规划一次，帧缓冲区即为对齐的FFT输入
+            self.frame_buf = pyfftw.zeros_aligned(n_fft, dtype='float32')
+            self.fft_out = pyfftw.empty_aligned(n_fft // 2 + 1, dtype='complex64')
+            self.fft = pyfftw.FFTW(self.frame_buf, self.fft_out, direction='FFTW_FORWARD',
+                                   flags=('FFTW_MEASURE',), threads=1)
+        else:
+            self.frame_buf = np.zeros(n_fft, dtype=np.float32)
+            self.fft_out = np.empty(n_fft // 2 + 1, dtype=np.complex64)
+        # 帧缓冲区中从该位置起已确定为0（FFTW规划会改写输入数组，因此初始视为无零值区）
+        self.zero_from = n_fft
+        self.x_new = np.logspace(np.log10(FREQ_LO), np.log10(FREQ_HI), _GRID_SIZE)
+        # 最近邻插值的索引映射只依赖频率轴，预先计算（距离相等时取较低频点，与interp1d一致）
+        right = np.clip(np.searchsorted(self.x_subband, self.x_new), 1, len(self.x_subband) - 1)
+        left = right - 1
+        self.nn_idx = np.where(self.x_new - self.x_subband[left] <= self.x_subband[right] - self.x_new, left, right)
+        self.out_of_range = (self.x_new < self.x_subband[0]) | (self.x_new > self.x_subband[-1])
+        # 三次样条插值对数据是线性的：对单位矩阵各列求样条即得插值矩阵，每帧只需一次矩阵向量乘
+        weights = CubicSpline(self.x_subband, np.eye(len(self.x_subband)), extrapolate=False)(self.x_new)
+        weights[self.out_of_range] = 0
+        self.smooth_weights = np.ascontiguousarray(weights, dtype=np.float32)
+
 class SpectrumCurveLayer(BaseLayer):
     def __init__(self):
         super().__init__()
         self.sample_rate = None
         self.x_subband = None
         self.x_new = None
+        self._axis = None                           # 当前频率轴及其派生数据（_FreqAxis）
         self.line = None
         self.current_volume = -np.inf
+        self._display_idx = np.arange(_GRID_SIZE)  # 绘制时从插值网格中抽取的点
+        self._xdata_dirty = True                    # 曲线x数据需要重新设置（频率轴或绘制点变化后）
+        self._line_y = None                         # 曲线当前的y数据数组，稳态下原地写入
+        self._ref_db = 20.0 * np.log10(max(BASE_PARAMS.ref_value, 1e-5))  # 参考值对应的dB（amin=1e-5）
+        self._refresh_params()
+
+    def _refresh_params(self):
+        """将process/draw中每帧使用的参数缓存为属性，避免每帧查字典"""
+        self._visible = SPECTRUM_CURVE_LAYER_PARAMS['visible']
+        self._skip_compute = not self._visible and not SPECTRUM_CURVE_LAYER_PARAMS['compute_when_hidden']
+        self._curve_row = INTERP_SMOOTH if SPECTRUM_CURVE_LAYER_PARAMS['smoothed_curve'] else INTERP_RAW
 
     def on_audio_params_changed(self, sample_rate, chunk_size, n_fft):
         """响应音频参数变化"""
         print(f'[Layer] SpectrumCurveLayer: sample_rate changed to {sample_rate}')
+        self._refresh_params()
         # 只有当参数实际变化时才更新
         if sample_rate != self.sample_rate:
             self.sample_rate = sample_rate
@@ -24,18 +112,22 @@ class SpectrumCurveLayer(BaseLayer):
             self._compute_freq_axis()
 
     def _compute_freq_axis(self):
-        """预计算频率轴（同原逻辑）"""
-        freqs = librosa.fft_frequencies(sr=self.sample_rate, n_fft=self.n_fft)
-        self.original_freq_mask = (freqs >= BASE_PARAMS['freq_range'][0]) & (freqs <= BASE_PARAMS['freq_range'][1])
-        self.x_subband = freqs[self.original_freq_mask]
-        self.x_new = np.logspace(np.log10(BASE_PARAMS['freq_range'][0]), np.log10(BASE_PARAMS['freq_range'][1]), 2000)
+        """
+        预计算频率轴（同原逻辑）
+        派生数据全部构建在新的_FreqAxis中，最后一次赋值发布；计算线程每帧只取一次引用，不会混用新旧数据
+        """
+        axis = _FreqAxis(self.sample_rate, self.n_fft)
+        self._axis = axis
+        self.x_subband = axis.x_subband
+        self.x_new = axis.x_new
+        self._xdata_dirty = True
 
     def initialize(self, fig, position):
         """初始化频谱线"""
         self.ax = fig.add_axes(position,frameon=False)
         self.ax.set_xscale('log')
         self.ax.set_yscale('linear')
-        self.ax.set_xlim(*BASE_PARAMS['freq_range'])
+        self.ax.set_xlim(FREQ_LO, FREQ_HI)
         self.ax.set_ylim(*SPECTRUM_CURVE_LAYER_PARAMS['amplitude_range'])
         self.line, = self.ax.plot([], [],
             color=COLORS['spectrum_curve'],
@@ -43,65 +135,99 @@ class SpectrumCurveLayer(BaseLayer):
             alpha=SPECTRUM_CURVE_LAYER_PARAMS['alpha'],
             zorder = SPECTRUM_CURVE_LAYER_PARAMS['zorder'],
             )
+        self._update_display_points()
+        fig.canvas.mpl_connect('resize_event', lambda event: self._update_display_points())
 
-    def _compute_spectrum(self, chunk):
-        """核心频谱计算逻辑"""
-        # 数据填充
-        if len(chunk) < self.n_fft:
-            chunk = np.pad(chunk, (0, self.n_fft - len(chunk)))
-        # --- 新增：计算音频块整体音量 ---
-        rms = np.sqrt(np.mean(chunk**2))  # 计算RMS
-        self.current_volume = librosa.amplitude_to_db([rms], ref=BASE_PARAMS['ref_value'])[0]  # 转换为dB
-        # STFT计算
-        D = librosa.stft(chunk, n_fft=self.n_fft, center=False)
-        magnitude = np.abs(D)
-        db_spectrum = librosa.amplitude_to_db(magnitude, ref=BASE_PARAMS['ref_value']).max(axis=1)
-        
-        # 使用预存的原始频率掩码
-        self.db_subband = db_spectrum[self.original_freq_mask]  # 关键修复点
+    def _update_display_points(self):
+        """按坐标轴像素宽度确定曲线绘制点数（网格为对数等距，均匀抽取即在屏幕上等距）"""
+        width = int(self.ax.get_window_extent().width)
+        n = max(_DISPLAY_POINTS_RANGE[0], min(_DISPLAY_POINTS_RANGE[1], width))
+        self._display_idx = np.unique(np.linspace(0, _GRID_SIZE - 1, n).round().astype(np.intp))
+        self._xdata_dirty = True
+
+    def _output_buffers(self, data_protocol, axis):
+        """
+        取当前数据槽中本图层的输出缓冲区(db_subband, interp_data)，首次使用或频率轴变化后重新分配
+        缓冲区随数据槽一起由画布的三缓冲调度，渲染线程正在读取的槽位不会被写入，稳态下每帧不再分配内存
+        整条频谱链路使用float32（音频块、FFT、dB谱、插值曲线），插值矩阵向量乘的访存量减半
+        """
+        bufs = data_protocol.buffers.get('spectrum')
+        if bufs is None or bufs[0].shape[0] != len(axis.x_subband):
+            bufs = (np.empty(len(axis.x_subband), dtype=np.float32), np.empty((2, len(axis.x_new)), dtype=np.float32))
+            data_protocol.buffers['spectrum'] = bufs
+        return bufs
+
+    def _compute_spectrum(self, axis, chunk, db_subband, interp_data):
+        """核心频谱计算逻辑，结果写入传入的db_subband与interp_data"""
+        chunk = np.asarray(chunk, dtype=np.float32)
+        # 计算音频块整体音量（按填充前的块计算RMS，点积一次完成，不生成平方临时数组）
+        rms = math.sqrt(float(np.dot(chunk, chunk)) / chunk.size)
+        # 转换为dB（与librosa.amplitude_to_db对单个值的结果相同）
+        self.current_volume = 20.0 * math.log10(max(rms, 1e-5)) - self._ref_db
+        # 块长度等于n_fft，center=False的STFT只有一帧，直接对加窗后的帧做实数FFT
+        # 加窗结果写入帧缓冲区头部；块较短时尾部补零，只清零尚未为0的部分
+        frame_buf = axis.frame_buf
+        n = min(chunk.size, frame_buf.size)
+        np.multiply(chunk[:n], axis.window[:n], out=frame_buf[:n])
+        if n < axis.zero_from:
+            frame_buf[n:axis.zero_from] = 0
+        axis.zero_from = n
+        fft_out = axis.fft() if axis.fft is not None else np.fft.rfft(frame_buf, out=axis.fft_out)
+        # 子带dB谱
+        _subband_db(fft_out, axis.subband_lo, axis.subband_hi, self._ref_db, db_subband)
+        self.db_subband = db_subband
         
-        # 双插值处理
-        interp_data = {}
-        try:
-            # 平滑插值
-            f_smooth = interp1d(self.x_subband, self.db_subband, 
-                            kind='cubic', bounds_error=False, 
-                            fill_value=-120)
-            interp_data['smooth'] = f_smooth(self.x_new)
-            
-            # 原始插值
-            f_raw = interp1d(self.x_subband, self.db_subband, 
-                        kind='nearest', bounds_error=False,
-                        fill_value=-120)
-            interp_data['raw'] = f_raw(self.x_new)
-        except Exception as e:
-            print(f"插值异常: {str(e)}")
-            interp_data['smooth'] = np.full_like(self.x_new, -120)
-            interp_data['raw'] = np.full_like(self.x_new, -120)
+        # 双插值处理，两条曲线分别写入同一数组的两行
+        # 平滑插值（not-a-knot三次样条，与interp1d(kind='cubic')相同）
+        np.dot(axis.smooth_weights, db_subband, out=interp_data[INTERP_SMOOTH])
+        # 原始插值（最近邻），直接按预计算的索引取值
+        np.take(db_subband, axis.nn_idx, out=interp_data[INTERP_RAW])
+        # 范围外填充-120
+        interp_data[:, axis.out_of_range] = -120
             
         return interp_data, self.db_subband  # 返回插值数据和原始子带数据
 
 
     def process(self, chunk, data_protocol):
-        if None == self.sample_rate: return
+        # 频率轴可能在主线程中被替换，本帧只取一次引用
+        axis = self._axis
+        if axis is None: return
+        # 隐藏且无需为其他图层提供数据时跳过全部计算（数据槽中频谱保持为None，音量为-inf）
+        if self._skip_compute:
+            return
         # 计算频谱
-        interp_data, db_subband = self._compute_spectrum(chunk)
-        rms = np.sqrt(np.mean(chunk**2))  # 计算RMS
-        volume = librosa.amplitude_to_db([rms], ref=BASE_PARAMS['ref_value'])[0]  # 转换为dB
+        db_subband, interp_data = self._output_buffers(data_protocol, axis)
+        interp_data, db_subband = self._compute_spectrum(axis, chunk, db_subband, interp_data)
         data_protocol.update(
-            x_subband=self.x_subband if hasattr(self, 'x_subband') else None,
-            x_new=self.x_new if hasattr(self, 'x_new') else None,
+            x_subband=axis.x_subband,
+            x_new=axis.x_new,
             spectrum=(interp_data, db_subband),
-            volume=volume
+            volume=self.current_volume
         )
         
     
     def draw(self, data_protocol):
-        if not SPECTRUM_CURVE_LAYER_PARAMS['visible']: return []
+        if not self._visible: return []
         if None == self.sample_rate: return
         # 更新频谱线
         interp_data = data_protocol.spectrum[0]
-        self.line.set_data(self.x_new, interp_data['smooth'] if SPECTRUM_CURVE_LAYER_PARAMS['smoothed_curve'] else interp_data['raw'])
+        curve = interp_data[self._curve_row]
+        # 只绘制按屏幕像素抽取的点，峰值检测仍使用完整网格
+        idx = self._display_idx
+        if self._xdata_dirty:
+            self.line.set_data(self.x_new[idx], curve[idx])
+            self._xdata_dirty = False
+            # Line2D保存的是y数据的副本，之后直接写入该数组（依赖matplotlib当前的内部表示，取不到可写数组时退回set_ydata）
+            y = self.line.get_ydata()
+            self._line_y = y if isinstance(y, np.ndarray) and y.flags.writeable and y.shape == idx.shape else None
+        elif self._line_y is not None:
+            # 频率轴不变，每帧只原地更新y数据，再让曲线按新数据重建路径
+            np.take(curve, idx, out=self._line_y)
+            self.line.recache_always()
+            self.line.stale = True
+        else:
+            self.line.set_ydata(curve[idx])
         return [self.line]
     def clean(self):
-        self.line.set_data([], [])
\ No newline at end of file
+        self.line.set_data([], [])
+        self._xdata_dirty = True
\ No newline at end of file